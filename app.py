@@ -1,17 +1,41 @@
 import openai
-import yfinance as yf
+import hashlib
+import hmac
+import multiprocessing
 import numpy as np
 import datetime as dt
-import matplotlib.pyplot as plt
 import requests
 import os
+import re
+import threading
+import time
 import pandas as pd
 from bs4 import BeautifulSoup
-from flask import Flask, request, abort, jsonify
+from flask import Flask, Response, request, abort, jsonify
 from linebot.v3.webhook import WebhookHandler, MessageEvent
 from linebot.v3.messaging import MessagingApi, ReplyMessageRequest, TextMessage, ImageMessage
 from linebot.v3.exceptions import InvalidSignatureError
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
 from dotenv import load_dotenv
+import charts
+import indicators
+from cache import TTLCache
+from chart_store import ChartStore
+from deadline import Deadline, DeadlineExceeded
+from jobs import JobQueue
+from fundamentals_store import FundamentalsStore
+from market_hours import now_taipei, price_ttl, fundamental_ttl, is_market_open, is_trading_day, settled_end
+from ohlcv_store import OHLCVStore
+from price_batcher import PriceBatcher
+from providers import create_provider
+from rate_limit import SourceLimiter
+from resolver import TickerResolver
+from report_pool import ReportPool
+from price_series import PriceSeries
+from shared_prices import SharedPriceStore
+from singleflight import SingleFlight
+from warmup import WarmupScheduler, parse_times
 
 # 讀取環境變數
 load_dotenv()
@@ -21,122 +45,692 @@ LINE_CHANNEL_ACCESS_TOKEN = os.getenv("LINE_CHANNEL_ACCESS_TOKEN")
 LINE_CHANNEL_SECRET = os.getenv("LINE_CHANNEL_SECRET")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# 報告工作池設定：worker 數量、佇列上限、佇列滿載策略 (reject / drop_oldest)
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "4"))
+REPORT_QUEUE_SIZE = int(os.getenv("REPORT_QUEUE_SIZE", "20"))
+REPORT_QUEUE_POLICY = os.getenv("REPORT_QUEUE_POLICY", "reject")
+
+# 工作佇列後端：memory（web 行程內執行）或 sqlite（web 只負責排入，由 `python -m worker` 執行）
+REPORT_QUEUE_BACKEND = os.getenv("REPORT_QUEUE_BACKEND", "memory")
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "200"))
+# 完成或失敗的工作保留秒數（由 worker 定期清除）
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(7 * 86400)))
+
+# 快速通道（報價、圖表）工作池設定，與 GPT 報告分開排程
+QUOTE_WORKERS = int(os.getenv("QUOTE_WORKERS", "2"))
+QUOTE_QUEUE_SIZE = int(os.getenv("QUOTE_QUEUE_SIZE", "50"))
+QUOTE_DAYS = int(os.getenv("QUOTE_DAYS", "10"))
+
+# 每個使用者／群組／聊天室的速率限制 (每秒補充 token 數、可累積數) 與同時進行中的工作上限
+SOURCE_RATE = float(os.getenv("SOURCE_RATE", "0.2"))
+SOURCE_BURST = int(os.getenv("SOURCE_BURST", "3"))
+SOURCE_MAX_IN_FLIGHT = int(os.getenv("SOURCE_MAX_IN_FLIGHT", "2"))
+
+# 繪圖行程數量（0 表示在目前執行緒繪製）與單張圖表的逾時秒數
+# 每個 web、worker、預熱行程各自有一組繪圖行程，預設只開 1 個，避免在容器中依主機核心數開出大量 matplotlib 行程
+CHART_PROCESSES = int(os.getenv("CHART_PROCESSES", "1"))
+CHART_TIMEOUT = float(os.getenv("CHART_TIMEOUT", "20"))
+# 圖表 PNG 記憶體快取上限 (MB)，以及同時寫入的磁碟目錄。worker.py、warmup 與多個 gunicorn worker
+# 在不同行程繪圖，靠這個共用目錄讓 web 行程讀得到；設為空字串時只放在記憶體（限單一行程部署）
+CHART_STORE_MB = int(os.getenv("CHART_STORE_MB", "64"))
+CHART_SPILL_DIR = os.getenv("CHART_SPILL_DIR", "charts")
+# 磁碟上圖檔的總大小上限 (MB) 與保存天數，超過時由最舊的開始刪除
+CHART_SPILL_MB = int(os.getenv("CHART_SPILL_MB", "512"))
+CHART_SPILL_DAYS = float(os.getenv("CHART_SPILL_DAYS", "7"))
+
+# 股價快取盤中的有效秒數，以及跨 worker 共用的記憶體映射檔案路徑、大小 (MB) 與索引筆數
+PRICE_CACHE_OPEN_TTL = float(os.getenv("PRICE_CACHE_OPEN_TTL", "60"))
+SHARED_PRICES_PATH = os.getenv("SHARED_PRICES_PATH") or None
+SHARED_PRICES_SIZE_MB = int(os.getenv("SHARED_PRICES_SIZE_MB", "64"))
+SHARED_PRICES_SLOTS = int(os.getenv("SHARED_PRICES_SLOTS", "4096"))
+# 行情資料來源：yfinance 或 fixture（離線錄製資料，可設定模擬延遲秒數）；
+# 設定 MARKET_DATA_RECORD_DIR 時會把取得的資料錄製成 fixture
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yfinance")
+FIXTURE_DIR = os.getenv("FIXTURE_DIR", "fixtures")
+FIXTURE_LATENCY = float(os.getenv("FIXTURE_LATENCY", "0"))
+MARKET_DATA_RECORD_DIR = os.getenv("MARKET_DATA_RECORD_DIR") or None
+# 上市櫃股票清單（代號、名稱、市場、別名）
+LISTINGS_PATH = os.getenv("LISTINGS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tw_listings.csv"))
+# 台股代號格式：4~6 碼數字，ETF 等可能帶一個英文字母
+SYMBOL_PATTERN = re.compile(r"^\d{4,6}[A-Z]?$")
+# 查無資料的股票代號保留秒數，期間內的查詢不再呼叫任何上游服務
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", "3600"))
+# 行程內快取（新聞、無效代號）最多保留的筆數
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", "512"))
+# 本機日K資料庫路徑
+OHLCV_DB_PATH = os.getenv("OHLCV_DB_PATH", "ohlcv.db")
+# 基本面資料庫路徑，以及平時與財報公告期間的有效秒數（過期時先回傳舊資料並在背景更新）
+FUNDAMENTALS_DB_PATH = os.getenv("FUNDAMENTALS_DB_PATH", "fundamentals.db")
+FUNDAMENTAL_TTL = float(os.getenv("FUNDAMENTAL_TTL", str(7 * 86400)))
+FUNDAMENTAL_EARNINGS_TTL = float(os.getenv("FUNDAMENTAL_EARNINGS_TTL", "21600"))
+# 管理用 API 的權杖（未設定時停用）
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# 新聞與圖表快取
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "600"))
+
+# 熱門清單預熱：股票清單、執行時間（台北時間，開盤前與收盤後）、是否在 web 行程內執行
+WARMUP_SYMBOLS = os.getenv("WARMUP_SYMBOLS", "大盤,2330,2317,2454,2308,2382,2881,2882,2891,0050")
+WARMUP_TIMES = os.getenv("WARMUP_TIMES", "08:30,14:00")
+WARMUP_IN_PROCESS = os.getenv("WARMUP_IN_PROCESS", "0") == "1"
+
+# 合併股價請求的等待秒數與單批最多股票數
+PRICE_BATCH_WINDOW = float(os.getenv("PRICE_BATCH_WINDOW", "0.05"))
+PRICE_BATCH_SIZE = int(os.getenv("PRICE_BATCH_SIZE", "20"))
+
+# 工作整體截止時間（從收到訊息起算，包含排隊、抓資料、繪圖、GPT 與推播）與各資料來源的逾時秒數
+REPORT_DEADLINE = float(os.getenv("REPORT_DEADLINE", "90"))
+QUOTE_DEADLINE = float(os.getenv("QUOTE_DEADLINE", "20"))
+PRICE_TIMEOUT = float(os.getenv("PRICE_TIMEOUT", "10"))
+FUNDAMENTAL_TIMEOUT = float(os.getenv("FUNDAMENTAL_TIMEOUT", "10"))
+NEWS_TIMEOUT = float(os.getenv("NEWS_TIMEOUT", "5"))
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", str(REPORT_WORKERS * 3)))
+# Yahoo 財報查詢沒有逾時參數，放在獨立的小執行緒池，卡住時不會佔用股價與新聞的 fetch_executor
+FUNDAMENTAL_WORKERS = int(os.getenv("FUNDAMENTAL_WORKERS", "4"))
+
+# 對外網址（圖表連結）與 GPT 模型
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "https://line-bot-flask-oha5.onrender.com")
+GPT_MODEL = os.getenv("GPT_MODEL", "gpt-3.5-turbo")
+
+# 報告使用的股價天數
+REPORT_DAYS = int(os.getenv("REPORT_DAYS", "90"))
+# 技術指標需要的額外歷史天數（日曆天），讓圖表起點就有 MA60 等長週期指標
+INDICATOR_WARMUP_DAYS = int(os.getenv("INDICATOR_WARMUP_DAYS", "120"))
+
+BUSY_MESSAGE = "目前查詢人數眾多，請稍後再試。"
+RATE_LIMITED_MESSAGE = "查詢過於頻繁，請稍後再試。"
+IN_FLIGHT_MESSAGE = "您的查詢仍在處理中，請等待完成後再送出新的查詢。"
+REPORT_FAILED_MESSAGE = "生成分析報告失敗，請稍後再試。"
+TIMEOUT_MESSAGE = "查詢逾時，請稍後再試。"
+UNKNOWN_SYMBOL_MESSAGE = "查無股票代號「{}」，請確認後再試。"
+
 if not LINE_CHANNEL_ACCESS_TOKEN or not LINE_CHANNEL_SECRET or not OPENAI_API_KEY:
     raise EnvironmentError("缺少必要的環境變數，請檢查 .env 文件設置是否正確")
+if REPORT_QUEUE_BACKEND == "sqlite" and not CHART_SPILL_DIR:
+    raise EnvironmentError("REPORT_QUEUE_BACKEND=sqlite 時圖表由 worker 行程繪製，必須設定 CHART_SPILL_DIR")
 
 # 初始化
 client = openai.Client(api_key=OPENAI_API_KEY)
 app = Flask(__name__)
 line_bot_api = MessagingApi(LINE_CHANNEL_ACCESS_TOKEN)
 handler = WebhookHandler(LINE_CHANNEL_SECRET)
-
-os.makedirs("static", exist_ok=True)
+report_pool = ReportPool(REPORT_WORKERS, REPORT_QUEUE_SIZE, REPORT_QUEUE_POLICY)
+quote_pool = ReportPool(QUOTE_WORKERS, QUOTE_QUEUE_SIZE, "reject", name="quote")
+report_flight = SingleFlight()
+source_limiter = SourceLimiter(SOURCE_RATE, SOURCE_BURST, SOURCE_MAX_IN_FLIGHT)
+job_queue = JobQueue(
+    JOB_DB_PATH, JOB_VISIBILITY_TIMEOUT, JOB_MAX_ATTEMPTS, max_pending=JOB_QUEUE_LIMIT
+) if REPORT_QUEUE_BACKEND == "sqlite" else None
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+fundamental_executor = ThreadPoolExecutor(max_workers=FUNDAMENTAL_WORKERS, thread_name_prefix="fundamental")
+shared_prices = SharedPriceStore(SHARED_PRICES_PATH, SHARED_PRICES_SIZE_MB * 1024 * 1024, SHARED_PRICES_SLOTS)
+ohlcv_store = OHLCVStore(OHLCV_DB_PATH)
+fundamentals_store = FundamentalsStore(FUNDAMENTALS_DB_PATH)
+fundamental_refresh = SingleFlight()
+ticker_resolver = TickerResolver.from_csv(LISTINGS_PATH)
+market_data = create_provider(MARKET_DATA_PROVIDER, FIXTURE_DIR, FIXTURE_LATENCY, MARKET_DATA_RECORD_DIR)
+news_cache = TTLCache(CACHE_SIZE, name="news")
+negative_cache = TTLCache(CACHE_SIZE, name="negative")
+price_batcher = PriceBatcher(lambda *args: download_symbols(*args), PRICE_BATCH_WINDOW, PRICE_BATCH_SIZE)
+chart_store = ChartStore(
+    CHART_STORE_MB * 1024 * 1024, CHART_SPILL_DIR,
+    spill_max_bytes=CHART_SPILL_MB * 1024 * 1024, spill_max_age=CHART_SPILL_DAYS * 86400
+)
+# 不在清單中、改用 .TWO 才查到資料的代號（例如清單更新前新上櫃的股票）
+discovered_symbols = {}
+render_pool = None
+render_pool_lock = threading.Lock()
 
 @app.route("/", methods=["GET"])
 def home():
     return "Hello from LINE Bot!"
 
-# 股票價格圖表生成
-def stock_price(stock_id="大盤", days=90):
+# 工作池狀態：佇列深度、等待時間
+@app.route("/stats", methods=["GET"])
+def stats():
+    data = {
+        "market_data": market_data.name,
+        "report_pool": report_pool.stats(),
+        "quote_pool": quote_pool.stats(),
+        "single_flight": report_flight.stats(),
+        "source_limiter": source_limiter.stats(),
+        "shared_prices": shared_prices.stats(),
+        "price_batcher": price_batcher.stats(),
+        "fundamentals_store": fundamentals_store.stats(),
+        "news_cache": news_cache.stats(),
+        "negative_cache": negative_cache.stats(),
+        "chart_store": chart_store.stats(),
+    }
+    if job_queue is not None:
+        data["job_queue"] = job_queue.stats()
+    if WARMUP_IN_PROCESS:
+        data["warmup"] = warmup_scheduler.stats()
+    return jsonify(data)
+
+# 圖表 id 由內容雜湊決定、內容永不改變，讓 LINE 與瀏覽器可以永久快取
+CHART_ID_PATTERN = re.compile(r"^[\w.\-]+_[a-z]+_[0-9a-f]{20}(_preview)?\.png$")
+
+
+def chart_headers(chart_id, png):
+    return {
+        "Content-Type": "image/png",
+        "Content-Length": str(len(png)),
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "ETag": f'"{chart_id}"',
+    }
+
+
+# 直接從記憶體回傳圖表
+@app.route("/charts/<chart_id>", methods=["GET"])
+def chart(chart_id):
+    if not CHART_ID_PATTERN.match(chart_id):
+        abort(404)
+    if request.headers.get("If-None-Match") == f'"{chart_id}"':
+        return Response(status=304)
+    png = chart_store.get(chart_id)
+    if png is None:
+        abort(404)
+    return Response(png, headers=chart_headers(chart_id, png))
+
+# 立即向 Yahoo 更新指定股票的基本面資料
+@app.route("/fundamentals/<stock_id>/refresh", methods=["POST"])
+def refresh_fundamentals(stock_id):
+    # 以固定時間比較權杖，避免從回應時間推測內容
+    token = request.headers.get("X-Admin-Token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        abort(403)
+
+    stock_id = normalize_stock_id(stock_id)
     if stock_id == "大盤":
-        stock_id = "^TWII"
-    else:
-        stock_id += ".TW"
+        abort(400, "大盤沒有基本面資料")
 
-    end = dt.date.today()
-    start = end - dt.timedelta(days=days)
+    eps = refresh_fundamental_data(yahoo_symbol(stock_id))
+    if eps is None:
+        abort(502, "基本面資料獲取失敗")
+    return jsonify({idx.strftime("%Y-%m-%d"): float(value) for idx, value in eps.items()})
 
-    try:
-        stock_data = yf.download(stock_id, start=start, end=end)
-        if stock_data.empty:
-            return None
+# 正規化使用者輸入的股票代號，讓同一檔股票的不同寫法（代號、中英文名稱、別名）共用同一份報告
+def normalize_stock_id(text):
+    stock_id = text.strip().upper()
+    if stock_id in ("大盤", "台股", "加權", "^TWII", "TWII"):
+        return "大盤"
+    stock_id = re.sub(r"\.TWO?$", "", stock_id)
+    listing = ticker_resolver.resolve(stock_id)
+    return listing.code if listing else stock_id
+
+
+# 使用者輸入轉換為 Yahoo 股票代號：清單中的股票依市場使用 .TW 或 .TWO，其餘預設為上市
+def yahoo_symbol(stock_id):
+    if stock_id == "大盤":
+        return "^TWII"
+    listing = ticker_resolver.resolve(stock_id)
+    if listing:
+        return listing.symbol
+    return discovered_symbols.get(stock_id, f"{stock_id}.TW")
+
+
+# 查詢新聞與顯示用的名稱
+def stock_display_name(stock_id):
+    if stock_id == "大盤":
+        return "台股"
+    listing = ticker_resolver.resolve(stock_id)
+    return listing.name if listing else stock_id
+
+
+# 最近查詢過但查無任何股價資料的代號
+# 不是代號格式（且不在上市櫃清單中）的文字不會有資料，不需要查詢
+def is_unknown_symbol(stock_id):
+    if stock_id == "大盤":
+        return False
+    if not SYMBOL_PATTERN.match(stock_id):
+        return True
+    return negative_cache.get(yahoo_symbol(stock_id)) is not None
+
+
+# 單份報告的資料上下文：每份上游資料只抓一次、每張圖只畫一次，
+# 圖表與 GPT 分析共用同一份物件
+class ReportContext:
+    def __init__(self, stock_id="大盤", days=90, deadline=None):
+        self.stock_id = stock_id
+        self.days = days
+        # 股價多抓指標暖身所需的天數，圖表只顯示最近 days 天
+        self.history_days = days + INDICATOR_WARMUP_DAYS
+        self.deadline = deadline or Deadline(REPORT_DEADLINE)
+        self.stock_name = stock_display_name(stock_id)
+        self._cache = {}
+
+    # 直接放入已取得的資料（例如由 async 版本抓取）
+    def preload(self, **data):
+        self._cache.update(data)
+
+    def _get(self, key, loader):
+        if key not in self._cache:
+            self.deadline.check(key)
+            self._cache[key] = loader()
+        return self._cache[key]
+
+    # 同時抓取股價、基本面與新聞，總等待時間不超過 deadline；
+    # 逾時或失敗的來源以查無資料 (None) 處理，不拖累整份報告
+    def prefetch(self):
+        deadline = self.deadline
+        deadline.check("資料抓取")
+        sources = {
+            "price_data": (
+                lambda: fetch_price_data(self.stock_id, self.history_days, deadline.timeout(PRICE_TIMEOUT)),
+                PRICE_TIMEOUT, fetch_executor
+            ),
+            "fundamental_data": (
+                lambda: fetch_fundamental_data(self.stock_id), FUNDAMENTAL_TIMEOUT, fundamental_executor
+            ),
+            "news": (
+                lambda: stock_news(self.stock_name, deadline.timeout(NEWS_TIMEOUT)), NEWS_TIMEOUT, fetch_executor
+            ),
+        }
+        started = time.monotonic()
+        futures = {
+            key: executor.submit(loader)
+            for key, (loader, _, executor) in sources.items()
+            if key not in self._cache
+        }
+
+        for key, future in futures.items():
+            source_remaining = max(0.0, started + sources[key][1] - time.monotonic())
+            timeout = deadline.timeout(source_remaining)
+            try:
+                self._cache[key] = future.result(timeout=timeout)
+            except FutureTimeout:
+                future.cancel()
+                print(f"{self.stock_id} {key} 逾時，以查無資料處理")
+                self._cache[key] = None
+            except Exception as e:
+                print(f"{self.stock_id} {key} 獲取失敗: {str(e)}")
+                self._cache[key] = None
+
+        print(f"{self.stock_id} 資料抓取完成，耗時 {time.monotonic() - started:.2f}s")
+
+    def price_data(self):
+        return self._get(
+            "price_data",
+            lambda: fetch_price_data(self.stock_id, self.history_days, self.deadline.timeout(PRICE_TIMEOUT))
+        )
+
+    def indicators(self):
+        return self._get("indicators", lambda: compute_indicators(self.price_data()))
+
+    def fundamental_data(self):
+        return self._get("fundamental_data", lambda: fetch_fundamental_data(self.stock_id))
+
+    def news(self):
+        return self._get("news", lambda: stock_news(self.stock_name, self.deadline.timeout(NEWS_TIMEOUT)))
+
+    def price_chart(self):
+        return self._get(
+            "price_chart",
+            lambda: render_price_chart(self.stock_id, self.price_data(), self.indicators(), self.days, self.deadline)
+        )
+
+    def eps_chart(self):
+        return self._get(
+            "eps_chart", lambda: render_eps_chart(self.stock_id, self.fundamental_data(), self.deadline)
+        )
+
+
+# 多檔股價下載，由 price_batcher 合併請求後呼叫
+def download_symbols(symbols, start, end, timeout=PRICE_TIMEOUT):
+    return market_data.price_history(symbols, start, end, timeout)
+
+
+# 股價歷史下載，依台股交易時段快取：盤中短 TTL，收盤後到下一個交易時段前都直接使用快取；
+# 快取放在跨 worker 共用的記憶體映射檔案，只保留日期、收盤價 (float32) 與成交量。
+# 快取未命中時從本機日K資料庫讀取，只向 yfinance 補抓資料庫沒有的日期
+def download_price_history(symbol, start, end, timeout=PRICE_TIMEOUT):
+    cached = shared_prices.get(symbol, start, end)
+    if cached is not None:
+        return PriceSeries(*cached)
+
+    now = now_taipei()
+    series = ohlcv_store.get(
+        symbol, start, end,
+        lambda fetch_start, fetch_end: price_batcher.fetch(symbol, fetch_start, fetch_end, timeout),
+        settled=settled_end(now)
+    )
+    if len(series) == 0:
+        # 空的區間不代表代號無效（休市期間、Yahoo 限流或網路錯誤都會回傳空資料）；
+        # 只有資料庫從未有過這檔股票、且不在上市櫃清單中時才記為無效代號
+        if ohlcv_store.coverage(symbol) is None and ticker_resolver.by_code(symbol.split(".")[0]) is None:
+            negative_cache.set(symbol, True, NEGATIVE_CACHE_TTL)
+        return series
+
+    # 區間包含今日時資料會隨盤中與收盤更新；收盤後 Yahoo 尚未出現今日日K時只短暫快取，稍後重抓
+    today = now.date()
+    intraday = end > today
+    ttl = price_ttl(PRICE_CACHE_OPEN_TTL, now, intraday)
+    if intraday and is_trading_day(today) and series.dates[-1] < np.datetime64(today, "D"):
+        ttl = PRICE_CACHE_OPEN_TTL
+    shared_prices.put(symbol, start, end, series.days, series.close, series.volume, ttl)
+    return series
+
+
+# 股價資料下載，回傳 PriceSeries（日期由舊到新），查無資料時回傳 None；
+# intraday 為 True 時也包含盤中尚未收盤的今日日K（報價用）
+def fetch_price_data(stock_id="大盤", days=90, timeout=PRICE_TIMEOUT, intraday=False):
+    if is_unknown_symbol(stock_id):
+        return None
+
+    symbol = yahoo_symbol(stock_id)
+    # yfinance 的 end 不含當日：收盤後（或休市日）區間延伸到明日，才會包含今日的日K
+    now = now_taipei()
+    end = now.date() + dt.timedelta(days=1) if intraday else settled_end(now)
+    start = now.date() - dt.timedelta(days=days)
 
-        stock_data['date'] = stock_data.index.strftime('%Y-%m-%d')
-        stock_data = stock_data.sort_index(ascending=True)  # 日期由舊到新排序
-
-        plt.figure(figsize=(10, 5))
-        plt.plot(stock_data['Close'], label='Closing Price')
-        plt.title(f"{stock_id} 股價走勢圖")
-        plt.xlabel("日期")
-        plt.ylabel("價格 (TWD)")
-        plt.legend()
-        plt.grid(True)
-
-        filename = f"{stock_id}_price_chart.png"
-        filepath = f"./static/{filename}"
-        plt.savefig(filepath)
-        plt.close()
-        return filepath
+    try:
+        series = download_price_history(symbol, start, end, timeout)
+        if not len(series) and symbol == f"{stock_id}.TW" and ticker_resolver.by_code(stock_id) is None:
+            # 清單以外的代號預設為上市，查無資料時再試上櫃，兩者都查無才會被記為無效代號
+            series = download_price_history(f"{stock_id}.TWO", start, end, timeout)
+            if len(series):
+                discovered_symbols[stock_id] = f"{stock_id}.TWO"
+        return series if len(series) else None
     except Exception as e:
         print(f"股價資料獲取失敗: {str(e)}")
         return None
 
 
-# 基本面 EPS 圖表生成
-def stock_fundamental(stock_id="大盤"):
-    if stock_id == "大盤":
+# 基本面 EPS 資料下載
+def fetch_fundamental_data(stock_id="大盤"):
+    if stock_id == "大盤" or is_unknown_symbol(stock_id):
         return None
 
-    stock_id += ".TW"
-    stock = yf.Ticker(stock_id)
+    symbol = yahoo_symbol(stock_id)
+    cached = fundamentals_store.get(symbol)
+    if cached is None:
+        return refresh_fundamental_data(symbol)
+
+    # 過期的資料照常使用，另外在背景向 Yahoo 更新，不讓報告等待
+    eps, fetched_at = cached
+    if time.time() - fetched_at > fundamental_ttl(FUNDAMENTAL_TTL, FUNDAMENTAL_EARNINGS_TTL):
+        if fundamental_refresh.join(symbol, None):
+            fundamental_executor.submit(background_refresh_fundamental_data, symbol)
+    return eps
 
+
+# 背景更新：只有透過 fundamental_refresh.join 取得執行權的這條路徑負責 finish
+def background_refresh_fundamental_data(symbol):
     try:
-        eps = stock.quarterly_financials.loc["Basic EPS"].dropna()
-        dates = [col.strftime('%Y-%m-%d') for col in stock.quarterly_financials.columns]
-
-        plt.figure(figsize=(10, 5))
-        plt.bar(dates[:len(eps)], eps)
-        plt.title(f"{stock_id} EPS 成長圖")
-        plt.xlabel("季度")
-        plt.ylabel("EPS")
-        plt.grid(True)
-
-        filename = f"{stock_id}_eps_chart.png"
-        filepath = f"./static/{filename}"
-        plt.savefig(filepath)
-        plt.close()
-        return filepath
+        refresh_fundamental_data(symbol)
+    finally:
+        fundamental_refresh.finish(symbol)
+
+
+# 向 Yahoo 取得各季 EPS 並寫入基本面資料庫；有財報但沒有 EPS 的標的（如 ETF）記為空資料。
+# yfinance 失敗時通常回傳空的 DataFrame 而非拋出例外，這種情況不寫入，以免把失敗當成「沒有 EPS」
+def refresh_fundamental_data(symbol):
+    try:
+        financials = market_data.quarterly_financials(symbol)
+        if financials is None or financials.empty:
+            print(f"{symbol} 基本面資料獲取失敗: 查無財報")
+            return None
+        if "Basic EPS" in financials.index:
+            eps = financials.loc["Basic EPS"].dropna()
+        else:
+            eps = pd.Series(dtype="float64", name="Basic EPS")
+        fundamentals_store.put(symbol, eps)
+        return eps
     except Exception as e:
         print(f"基本面資料獲取失敗: {str(e)}")
         return None
+
+
+# 取得繪圖用的行程池（第一次使用時才建立）。
+# 建立時 web 行程已有許多執行緒（請求、預熱、背景更新），此時 fork 可能複製到被其他執行緒
+# 持有的鎖而卡死，因此明確使用 forkserver（不支援時用 spawn）：子行程由乾淨的行程產生，
+# 不複製目前行程的狀態。forkserver 預先載入 charts，每個子行程不必重新載入 matplotlib
+def get_render_pool():
+    global render_pool
+    with render_pool_lock:
+        if render_pool is None and CHART_PROCESSES > 0:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload(["charts"])
+            else:
+                context = multiprocessing.get_context("spawn")
+            render_pool = ProcessPoolExecutor(max_workers=CHART_PROCESSES, mp_context=context)
+    return render_pool
+
+
+# 在繪圖行程池中執行繪圖函式，未啟用行程池時直接在目前執行緒繪製；
+# 超過截止時間時取消尚未開始的繪圖
+def render_png(fn, *args, deadline=None):
+    if deadline is not None:
+        deadline.check("圖表繪製")
+    pool = get_render_pool()
+    if pool is None:
+        return fn(*args)
+
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        pool = reset_render_pool(pool)
+        future = pool.submit(fn, *args)
+    try:
+        return future.result(timeout=deadline.timeout(CHART_TIMEOUT) if deadline else CHART_TIMEOUT)
+    except FutureTimeout:
+        future.cancel()
+        raise
+    except BrokenProcessPool:
+        # 繪圖子行程異常結束（記憶體不足被終止等），丟棄壞掉的行程池，下一張圖表改用新的行程池
+        reset_render_pool(pool)
+        raise
+
+
+# 丟棄已損壞的行程池並回傳新的行程池；其他執行緒已經換過時直接使用新的
+def reset_render_pool(broken):
+    global render_pool
+    with render_pool_lock:
+        if render_pool is broken:
+            print("繪圖行程異常結束，重新建立行程池")
+            render_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+    return get_render_pool()
+
+
+# 圖表 id：以股票代號、圖表種類、最後一筆資料日期與資料內容雜湊命名，
+# 相同輸入永遠對應同一個 id，內容不同就是不同 id，不會互相覆寫
+def chart_id(kind, symbol, last_date, *arrays):
+    digest = hashlib.sha1(f"{charts.CHART_VERSION}:{kind}:{symbol}:{last_date}".encode())
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    # 指數代號如 ^TWII 含網址不安全字元，只保留英數字與 . -
+    name = re.sub(r"[^\w.\-]", "", symbol)
+    return f"{name}_{kind}_{digest.hexdigest()[:20]}.png"
+
+
+# 預覽圖與原圖使用相同雜湊，只多 _preview 後綴
+def preview_id(chart_id):
+    return chart_id[:-len(".png")] + "_preview.png"
+
+
+# 原圖與預覽圖都還在時不需重新繪製
+def has_chart(key):
+    return chart_store.get(key) is not None and chart_store.get(preview_id(key)) is not None
+
+
+def store_chart(key, rendered):
+    png, preview = rendered
+    chart_store.put(key, png)
+    chart_store.put(preview_id(key), preview)
+    return key
+
+
+# 技術指標：以完整的歷史股價計算，查無股價時回傳 None
+def compute_indicators(series):
+    if series is None:
+        return None
+    return indicators.compute(series.close, series.volume)
+
+
+# 股價圖疊加的指標
+PRICE_CHART_OVERLAYS = ("ma20", "ma60", "bb_upper", "bb_lower")
+
+
+# 股票價格圖表繪製（最近 days 天，疊加均線與布林通道），回傳圖表 id（原圖與預覽圖存於 chart_store）
+def render_price_chart(stock_id, series, ind=None, days=REPORT_DAYS, deadline=None):
+    if series is None:
+        return None
+
+    symbol = yahoo_symbol(stock_id)
+    try:
+        first = series.start_index(now_taipei().date() - dt.timedelta(days=days))
+        shown = series.tail(len(series) - first)
+        overlays = {name: ind[name][first:] for name in PRICE_CHART_OVERLAYS} if ind else {}
+        key = chart_id("price", symbol, series.date_str(-1), shown.days, shown.close, *overlays.values())
+        if has_chart(key):
+            return key
+
+        rendered = render_png(
+            charts.render_price_png,
+            f"{symbol} 股價走勢圖",
+            shown.dates,
+            shown.close,
+            overlays,
+            deadline=deadline,
+        )
+        return store_chart(key, rendered)
+    except Exception as e:
+        print(f"股價圖表繪製失敗: {str(e)}")
+        return None
+
+
+# 基本面 EPS 圖表繪製
+def render_eps_chart(stock_id, eps, deadline=None):
+    if eps is None or eps.empty:
+        return None
+
+    symbol = yahoo_symbol(stock_id)
+    try:
+        labels = [col.strftime('%Y-%m-%d') for col in eps.index]
+        values = eps.to_numpy(dtype=np.float64)
+        key = chart_id("eps", symbol, labels[-1], "|".join(labels).encode(), values)
+        if has_chart(key):
+            return key
+
+        rendered = render_png(charts.render_eps_png, f"{symbol} EPS 成長圖", labels, values, deadline=deadline)
+        return store_chart(key, rendered)
+    except Exception as e:
+        print(f"基本面圖表繪製失敗: {str(e)}")
+        return None
+
+
+# 股票價格圖表生成
+def stock_price(stock_id="大盤", days=90, ctx=None):
+    ctx = ctx or ReportContext(stock_id, days)
+    return ctx.price_chart()
+
+
+# 基本面 EPS 圖表生成
+def stock_fundamental(stock_id="大盤", ctx=None):
+    ctx = ctx or ReportContext(stock_id)
+    return ctx.eps_chart()
+
+
 # 新聞爬蟲
-def stock_news(stock_name="台股"):
-    data = []
+def stock_news(stock_name="台股", timeout=NEWS_TIMEOUT):
+    url = news_url(stock_name)
+    news = news_cache.get(url)
+    if news is not None:
+        return news
+
     try:
-        stock_name = "台股" if stock_name == "大盤" else stock_name
-        json_data = requests.get(
-            f'https://ess.api.cnyes.com/ess/api/v1/news/keyword?q={stock_name}&limit=5&page=1'
-        ).json()
-
-        items = json_data['data']['items']
-        for item in items:
-            title = item["title"]
-            publish_at = dt.datetime.utcfromtimestamp(item["publishAt"]).strftime('%Y-%m-%d')
-            data.append(f"{publish_at}: {title}")
-        print("新聞資料:")
-        print("\n".join(data))
+        json_data = requests.get(url, timeout=timeout).json()
+        news = parse_news(json_data)
+        news_cache.set(url, news, NEWS_CACHE_TTL)
+        return news
     except Exception as e:
         print(f"新聞獲取失敗: {str(e)}")
+        return [{"message": "查無新聞"}]
 
+
+def news_url(stock_name):
+    stock_name = "台股" if stock_name == "大盤" else stock_name
+    return f'https://ess.api.cnyes.com/ess/api/v1/news/keyword?q={stock_name}&limit=5&page=1'
+
+
+# 解析鉅亨網新聞 API 回應
+def parse_news(json_data):
+    data = []
+    items = json_data['data']['items']
+    for item in items:
+        title = item["title"]
+        publish_at = dt.datetime.utcfromtimestamp(item["publishAt"]).strftime('%Y-%m-%d')
+        data.append(f"{publish_at}: {title}")
+    print("新聞資料:")
+    print("\n".join(data))
     return data[:3] if data else [{"message": "查無新聞"}]
 
 
-# GPT 股票分析報告生成
-def stock_gpt_analysis(stock_id):
-    stock_name = "台股" if stock_id == "大盤" else stock_id
-    price_data = stock_price(stock_id) or "查無股價資料"
-    fund_data = stock_fundamental(stock_id) or "查無基本面資料"
-    news_data = stock_news(stock_name) or "查無新聞資料"
+# 提供給 GPT 的股價摘要：近期收盤價
+def price_summary(series, rows=10):
+    if series is None:
+        return None
+    tail = series.tail(rows)
+    return "\n".join(f"{date}: {value:.2f}" for date, value in zip(tail.dates, tail.close))
+
 
-    messages = [
+# 提供給 GPT 的技術指標摘要：各指標最新數值
+def indicator_summary(series, ind):
+    if series is None or ind is None:
+        return None
+    values = indicators.latest(ind)
+
+    def fmt(name, digits=2):
+        value = values[name]
+        return "資料不足" if value is None else f"{value:,.{digits}f}"
+
+    volume_ma20 = values["volume_ma20"]
+    volume_ratio = f"{series.volume[-1] / volume_ma20:.2f} 倍" if volume_ma20 else "資料不足"
+    return "\n".join([
+        f"收盤價: {float(series.close[-1]):.2f}",
+        f"均線 MA5/MA20/MA60: {fmt('ma5')} / {fmt('ma20')} / {fmt('ma60')}",
+        f"RSI(14): {fmt('rsi', 1)}",
+        f"MACD(12,26,9): DIF {fmt('macd')}、訊號線 {fmt('macd_signal')}、柱狀 {fmt('macd_hist')}",
+        f"布林通道(20,2): 上軌 {fmt('bb_upper')}、中軌 {fmt('bb_middle')}、下軌 {fmt('bb_lower')}",
+        f"成交量 5日/20日均量: {fmt('volume_ma5', 0)} / {fmt('volume_ma20', 0)}，最新一日為 20 日均量的 {volume_ratio}",
+    ])
+
+
+# 提供給 GPT 的基本面摘要：各季 EPS
+def fundamental_summary(eps):
+    if eps is None or eps.empty:
+        return None
+    return "\n".join(f"{idx.strftime('%Y-%m-%d')}: {value}" for idx, value in eps.items())
+
+
+# GPT 分析使用的對話內容
+def gpt_messages(ctx):
+    price_data = price_summary(ctx.price_data()) or "查無股價資料"
+    indicator_data = indicator_summary(ctx.price_data(), ctx.indicators()) or "查無技術指標資料"
+    fund_data = fundamental_summary(ctx.fundamental_data()) or "查無基本面資料"
+    news_data = ctx.news() or "查無新聞資料"
+
+    return [
         {"role": "system", "content": "你是一位專業的股票分析師，請提供深入的分析報告，並用中文撰寫。"},
-        {"role": "user", "content": f"請分析 {stock_name} 的股價與基本面與新聞。\n股價資料:\n{price_data}\n基本面資料:\n{fund_data}\n新聞:\n{news_data}"}
+        {"role": "user", "content": f"請分析 {ctx.stock_name} 的股價與基本面與新聞。\n股價資料:\n{price_data}\n技術指標:\n{indicator_data}\n基本面資料:\n{fund_data}\n新聞:\n{news_data}"}
     ]
 
+
+# GPT 股票分析報告生成
+def stock_gpt_analysis(stock_id, ctx=None):
+    ctx = ctx or ReportContext(stock_id)
+    messages = gpt_messages(ctx)
+    ctx.deadline.check("GPT 分析")
+
     try:
         response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages
+            model=GPT_MODEL,
+            messages=messages,
+            timeout=ctx.deadline.remaining()
         )
         gpt_report = response.choices[0].message.content
         print("GPT 分析報告:")
@@ -144,7 +738,7 @@ def stock_gpt_analysis(stock_id):
         return gpt_report
     except Exception as e:
         print(f"生成分析報告失敗: {str(e)}")
-        return "生成分析報告失敗，請稍後再試。"
+        return REPORT_FAILED_MESSAGE
 
 @app.route("/callback", methods=["POST"])
 def callback():
@@ -170,31 +764,243 @@ def callback():
 
 @handler.add(MessageEvent, message=TextMessage)
 def handle_message(event):
-    user_message = event.message.text.strip()
+    command, stock_id = parse_command(event.message.text)
     user_id = event.source.user_id
+    key = report_key(stock_id, command=command)
+
+    # 已知無效的代號直接回覆，不佔用任何名額或工作
+    if is_unknown_symbol(stock_id):
+        line_bot_api.reply_message(
+            event.reply_token,
+            ReplyMessageRequest(messages=[TextMessage(text=UNKNOWN_SYMBOL_MESSAGE.format(stock_id))])
+        )
+        return
+
+    # 超過速率或同時進行中上限時直接回覆，不排入任何工作
+    hold = source_limiter.new_hold()
+    limited = source_limiter.acquire(source_keys(event.source), hold)
+    if limited is not None:
+        reply_text = RATE_LIMITED_MESSAGE if limited == "rate" else IN_FLIGHT_MESSAGE
+        line_bot_api.reply_message(
+            event.reply_token,
+            ReplyMessageRequest(messages=[TextMessage(text=reply_text)])
+        )
+        return
+
+    if command == "report" and job_queue is not None:
+        # 工作交給其他行程的 worker，無法得知完成時間，排入後即釋放名額
+        accepted = job_queue.enqueue(key, stock_id, user_id) is not None
+        source_limiter.release(hold)
+    elif command == "report":
+        accepted = submit_job(report_pool, build_report, stock_id, key, user_id, hold, Deadline(REPORT_DEADLINE))
+    else:
+        accepted = submit_job(quote_pool, COMMANDS[command], stock_id, key, user_id, hold, Deadline(QUOTE_DEADLINE))
+
+    if not accepted:
+        reply_text = BUSY_MESSAGE
+    elif command == "report":
+        reply_text = "分析中，請稍候..."
+    else:
+        reply_text = "查詢中，請稍候..."
 
     line_bot_api.reply_message(
         event.reply_token,
-        ReplyMessageRequest(messages=[TextMessage(text="分析中，請稍候...")])
+        ReplyMessageRequest(messages=[TextMessage(text=reply_text)])
     )
 
-    threading.Thread(target=generate_report, args=(user_message, user_id)).start()
+
+# 限流依據：使用者本身，以及訊息所在的群組或聊天室；
+# 群組與聊天室中未同意取得個人資料的使用者沒有 user_id，只依群組或聊天室限流
+def source_keys(source):
+    keys = []
+    if getattr(source, "user_id", None):
+        keys.append(f"user:{source.user_id}")
+    if getattr(source, "group_id", None):
+        keys.append(f"group:{source.group_id}")
+    if getattr(source, "room_id", None):
+        keys.append(f"room:{source.room_id}")
+    return keys
+
+
+# 指令解析：「報價 2330」、「2330 漲跌」、「圖 大盤」走快速通道，其餘文字視為完整報告
+def parse_command(text):
+    words = text.split()
+    if len(words) == 2:
+        for command, aliases in COMMAND_ALIASES.items():
+            if words[0].lower() in aliases:
+                return command, normalize_stock_id(words[1])
+            if words[1].lower() in aliases:
+                return command, normalize_stock_id(words[0])
+    return "report", normalize_stock_id(text)
+
+
+# 加入等待名單，第一位請求者負責把工作送進對應的工作池；
+# 等待者為 (使用者, 名額憑證)，工作結束時逐一釋放
+def submit_job(pool, build, stock_id, key, user_id, hold, deadline):
+    if not report_flight.join(key, (user_id, hold)):
+        return True
+
+    accepted = pool.submit(
+        generate_report, stock_id, key, build, deadline,
+        on_drop=lambda: abandon_job(key)
+    )
+    if not accepted:
+        notify_busy([uid for uid in release_waiters(report_flight.finish(key)) if uid != user_id])
+    return accepted
+
+
+# 工作被丟棄：釋放名額並通知所有等待者
+def abandon_job(key):
+    notify_busy(release_waiters(report_flight.finish(key)))
+
+
+# 釋放等待者佔用的名額，回傳不重複的使用者（同一位使用者重複送出時只推播一次）
+def release_waiters(waiters):
+    user_ids = []
+    for user_id, hold in waiters:
+        source_limiter.release(hold)
+        if user_id not in user_ids:
+            user_ids.append(user_id)
+    return user_ids
+
+
+# 同一檔股票、同樣指令與參數的工作共用一次執行
+def report_key(stock_id, days=REPORT_DAYS, command="report"):
+    return f"{command}:{stock_id}:{days}"
 
 
-def generate_report(stock_id, user_id):
+# 排隊中的工作被丟棄時通知使用者
+def notify_busy(user_ids):
+    for user_id in user_ids:
+        line_bot_api.push_message(user_id, [TextMessage(text=BUSY_MESSAGE)])
+
+
+# 快速報價：最新價格（盤中為今日成交價，收盤後為今日收盤價）與漲跌
+def build_quote(stock_id, deadline):
+    series = fetch_price_data(stock_id, QUOTE_DAYS, deadline.timeout(PRICE_TIMEOUT), intraday=True)
+    if series is None or len(series) < 2:
+        return [TextMessage(text=f"查無 {stock_id} 股價資料")]
+
+    last, prev = float(series.close[-1]), float(series.close[-2])
+    change = last - prev
+    label = "成交價" if is_market_open() and series.date_str(-1) == now_taipei().date().isoformat() else "收盤價"
+    return [TextMessage(text=(
+        f"{stock_id} {series.date_str(-1)} {label} {last:.2f}\n"
+        f"漲跌 {change:+.2f} ({change / prev * 100:+.2f}%)"
+    ))]
+
+
+# 快速圖表：只畫股價走勢圖，不呼叫 GPT
+def build_chart(stock_id, deadline, days=REPORT_DAYS):
+    chart = stock_price(stock_id, days, ctx=ReportContext(stock_id, days, deadline))
+    if chart is None:
+        return [TextMessage(text=f"查無 {stock_id} 股價資料")]
+    return chart_messages([chart])
+
+
+# 產生報告訊息（文字分析與圖表）
+def build_report(stock_id, deadline, days=REPORT_DAYS):
     print(f"生成報告中，股票代號: {stock_id}")
-    price_chart = stock_price(stock_id)
-    eps_chart = stock_fundamental(stock_id)
-    gpt_report = stock_gpt_analysis(stock_id)
+    if is_unknown_symbol(stock_id):
+        return [TextMessage(text=UNKNOWN_SYMBOL_MESSAGE.format(stock_id))]
 
-    messages = [TextMessage(text=f"{stock_id} 分析報告:\n\n{gpt_report}")]
+    ctx = ReportContext(stock_id, days, deadline)
+    ctx.prefetch()
+    if ctx.price_data() is None and is_unknown_symbol(stock_id):
+        return [TextMessage(text=UNKNOWN_SYMBOL_MESSAGE.format(stock_id))]
+    price_chart = stock_price(stock_id, days, ctx=ctx)
+    eps_chart = stock_fundamental(stock_id, ctx=ctx)
+    gpt_report = stock_gpt_analysis(stock_id, ctx=ctx)
+
+    return report_messages(stock_id, gpt_report, [price_chart, eps_chart])
+
+
+# 組合推播訊息：分析文字加上圖表
+def report_messages(stock_id, gpt_report, charts):
+    return [TextMessage(text=f"{stock_id} 分析報告:\n\n{gpt_report}")] + chart_messages(charts)
 
-    for chart in [price_chart, eps_chart]:
-        if chart:
-            url = f"https://line-bot-flask-oha5.onrender.com/static/{os.path.basename(chart)}"
-            messages.append(ImageMessage(original_content_url=url, preview_image_url=url))
 
-    line_bot_api.push_message(user_id, messages)
+def chart_messages(charts):
+    messages = []
+    for chart in charts:
+        if chart:
+            messages.append(ImageMessage(
+                original_content_url=f"{PUBLIC_BASE_URL}/charts/{chart}",
+                preview_image_url=f"{PUBLIC_BASE_URL}/charts/{preview_id(chart)}",
+            ))
+    return messages
+
+
+# 指令對應的訊息產生函式
+COMMANDS = {
+    "report": build_report,
+    "quote": build_quote,
+    "chart": build_chart,
+}
+COMMAND_ALIASES = {
+    "quote": ("報價", "股價", "漲跌", "price", "quote"),
+    "chart": ("圖", "圖表", "走勢", "chart"),
+}
+
+
+# 執行工作並推播給所有等待同一份結果的使用者
+def generate_report(stock_id, key, build, deadline):
+    try:
+        deadline.check("排隊")
+        messages = build(stock_id, deadline)
+        # 超過截止時間才完成的結果不再推播，改為逾時通知
+        deadline.check("推播")
+    except DeadlineExceeded as e:
+        print(f"{stock_id} 工作逾時: {str(e)}")
+        messages = [TextMessage(text=TIMEOUT_MESSAGE)]
+    except Exception as e:
+        print(f"生成報告失敗: {str(e)}")
+        messages = [TextMessage(text=REPORT_FAILED_MESSAGE)]
+
+    push_report(release_waiters(report_flight.finish(key)), messages)
+
+
+# 推播報告給多位使用者，單一使用者失敗不影響其他人
+def push_report(user_ids, messages):
+    print(f"報告推播給 {len(user_ids)} 位使用者")
+    for user_id in user_ids:
+        try:
+            line_bot_api.push_message(user_id, messages)
+        except Exception as e:
+            print(f"推播報告失敗 ({user_id}): {str(e)}")
+
+
+# 預熱熱門股票：同時抓取股價、基本面並繪製圖表（股價請求會經由 price_batcher 合併下載）。
+# 收盤後的預熱會取得當日收盤的日K（見 settled_end）。新聞不預熱：快取只有 NEWS_CACHE_TTL 秒，
+# 且 python -m warmup 在獨立行程執行，抓到的新聞到不了 web 行程
+def warm_symbols(stock_ids):
+    def warm(stock_id):
+        ctx = ReportContext(stock_id, REPORT_DAYS, Deadline(REPORT_DEADLINE))
+        ctx.preload(news=None)
+        ctx.prefetch()
+        ctx.price_chart()
+        ctx.eps_chart()
+
+    # 使用獨立的執行緒池，避免佔滿 prefetch 本身需要的 fetch_executor；
+    # 執行緒數與單批上限相同，整份清單的股價請求能在同一個 window 內合併成一次下載
+    workers = max(1, min(len(stock_ids), PRICE_BATCH_SIZE))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warmup") as pool:
+        futures = {stock_id: pool.submit(warm, stock_id) for stock_id in stock_ids}
+        for stock_id, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                print(f"{stock_id} 預熱失敗: {str(e)}")
+
+
+warmup_scheduler = WarmupScheduler(
+    [normalize_stock_id(s) for s in WARMUP_SYMBOLS.split(",") if s.strip()],
+    parse_times(WARMUP_TIMES),
+    warm_symbols
+)
+# 繪圖子行程以 spawn/forkserver 啟動時可能重新載入主程式模組，只在主行程啟動排程
+if WARMUP_IN_PROCESS and multiprocessing.parent_process() is None:
+    warmup_scheduler.start()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,225 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+from openai import AsyncOpenAI
+from quart import Quart, Response, request, abort, jsonify
+from linebot.v3 import WebhookParser
+from linebot.v3.exceptions import InvalidSignatureError
+from linebot.v3.messaging import (
+    AsyncApiClient, AsyncMessagingApi, Configuration,
+    ReplyMessageRequest, PushMessageRequest, TextMessage
+)
+from linebot.v3.webhooks import MessageEvent, TextMessageContent
+
+from app import (
+    LINE_CHANNEL_ACCESS_TOKEN, LINE_CHANNEL_SECRET, OPENAI_API_KEY, GPT_MODEL,
+    REPORT_DAYS, REPORT_DEADLINE, QUOTE_DEADLINE, PRICE_TIMEOUT, FUNDAMENTAL_TIMEOUT, NEWS_TIMEOUT,
+    BUSY_MESSAGE, RATE_LIMITED_MESSAGE, IN_FLIGHT_MESSAGE, REPORT_FAILED_MESSAGE, TIMEOUT_MESSAGE,
+    UNKNOWN_SYMBOL_MESSAGE, CHART_ID_PATTERN, COMMANDS,
+    chart_store, chart_headers, source_limiter, fundamental_executor,
+    ReportContext, parse_command, is_unknown_symbol, source_keys, report_key, release_waiters,
+    fetch_price_data, fetch_fundamental_data, news_url, parse_news, gpt_messages, report_messages
+)
+from deadline import Deadline, DeadlineExceeded
+
+# async 版本設定：同時進行中的報告上限、yfinance 與繪圖使用的執行緒數量
+ASYNC_MAX_REPORTS = int(os.getenv("ASYNC_MAX_REPORTS", "200"))
+ASYNC_FETCH_WORKERS = int(os.getenv("ASYNC_FETCH_WORKERS", "16"))
+
+# ASGI 版本的 LINE Bot：webhook、鉅亨網、LINE 與 OpenAI 都走非同步 I/O，
+# 只有 yfinance 與圖表繪製交給執行緒池。啟動方式: hypercorn async_app:app
+app = Quart(__name__)
+parser = WebhookParser(LINE_CHANNEL_SECRET)
+openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+# yfinance 下載與等待繪圖行程的執行緒
+fetch_executor = ThreadPoolExecutor(max_workers=ASYNC_FETCH_WORKERS, thread_name_prefix="async-fetch")
+
+# 進行中的工作：key -> [(使用者, 名額憑證)]
+in_flight = {}
+background_tasks = set()
+
+
+@app.before_serving
+async def startup():
+    app.http_session = aiohttp.ClientSession()
+    app.line_api_client = AsyncApiClient(Configuration(access_token=LINE_CHANNEL_ACCESS_TOKEN))
+    app.line_bot_api = AsyncMessagingApi(app.line_api_client)
+
+
+@app.after_serving
+async def shutdown():
+    await app.http_session.close()
+    await app.line_api_client.close()
+
+
+@app.route("/", methods=["GET"])
+async def home():
+    return "Hello from LINE Bot!"
+
+
+@app.route("/stats", methods=["GET"])
+async def stats():
+    return jsonify({
+        "in_flight": len(in_flight),
+        "waiting": sum(len(users) for users in in_flight.values()),
+        "tasks": len(background_tasks),
+    })
+
+
+# 直接從記憶體回傳圖表（與同步版相同的 /charts 路徑）
+@app.route("/charts/<chart_id>", methods=["GET"])
+async def chart(chart_id):
+    if not CHART_ID_PATTERN.match(chart_id):
+        abort(404)
+    if request.headers.get("If-None-Match") == f'"{chart_id}"':
+        return Response("", status=304)
+    png = chart_store.get(chart_id)
+    if png is None:
+        abort(404)
+    return Response(png, headers=chart_headers(chart_id, png))
+
+
+@app.route("/callback", methods=["POST"])
+async def callback():
+    signature = request.headers.get('X-Line-Signature')
+    body = await request.get_data(as_text=True)
+
+    if not signature or not body:
+        abort(400, "Missing signature or body")
+
+    try:
+        events = parser.parse(body, signature)
+    except InvalidSignatureError:
+        print("InvalidSignatureError: Signature did not match")
+        abort(400, "Invalid signature")
+
+    for event in events:
+        if isinstance(event, MessageEvent) and isinstance(event.message, TextMessageContent):
+            await handle_message(event)
+
+    return "OK", 200
+
+
+# 與同步版相同的指令解析、無效代號回覆與來源限流
+async def handle_message(event):
+    command, stock_id = parse_command(event.message.text)
+    user_id = event.source.user_id
+    key = report_key(stock_id, command=command)
+
+    if is_unknown_symbol(stock_id):
+        reply_text = UNKNOWN_SYMBOL_MESSAGE.format(stock_id)
+    else:
+        hold = source_limiter.new_hold()
+        limited = source_limiter.acquire(source_keys(event.source), hold)
+        if limited is not None:
+            reply_text = RATE_LIMITED_MESSAGE if limited == "rate" else IN_FLIGHT_MESSAGE
+        elif key in in_flight:
+            in_flight[key].append((user_id, hold))
+            reply_text = "分析中，請稍候..." if command == "report" else "查詢中，請稍候..."
+        elif len(in_flight) >= ASYNC_MAX_REPORTS:
+            source_limiter.release(hold)
+            reply_text = BUSY_MESSAGE
+        else:
+            in_flight[key] = [(user_id, hold)]
+            task = asyncio.create_task(generate_report(stock_id, key, command))
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+            reply_text = "分析中，請稍候..." if command == "report" else "查詢中，請稍候..."
+
+    await app.line_bot_api.reply_message(
+        ReplyMessageRequest(reply_token=event.reply_token, messages=[TextMessage(text=reply_text)])
+    )
+
+
+# 在執行緒池中執行阻塞函式，逾時視為查無資料
+async def run_blocking(executor, timeout, fn, *args):
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(loop.run_in_executor(executor, fn, *args), timeout)
+    except asyncio.TimeoutError:
+        print(f"{fn.__name__} 逾時，以查無資料處理")
+        return None
+
+
+async def stock_news(stock_name):
+    try:
+        timeout = aiohttp.ClientTimeout(total=NEWS_TIMEOUT)
+        async with app.http_session.get(news_url(stock_name), timeout=timeout) as response:
+            return parse_news(await response.json(content_type=None))
+    except Exception as e:
+        print(f"新聞獲取失敗: {str(e)}")
+        return [{"message": "查無新聞"}]
+
+
+async def stock_gpt_analysis(ctx):
+    try:
+        response = await openai_client.chat.completions.create(
+            model=GPT_MODEL,
+            messages=gpt_messages(ctx)
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        print(f"生成分析報告失敗: {str(e)}")
+        return REPORT_FAILED_MESSAGE
+
+
+async def build_report(stock_id, days=REPORT_DAYS):
+    print(f"生成報告中，股票代號: {stock_id}")
+    ctx = ReportContext(stock_id, days)
+
+    price_data, fundamental_data, news = await asyncio.gather(
+        run_blocking(fetch_executor, PRICE_TIMEOUT, fetch_price_data, stock_id, ctx.history_days),
+        run_blocking(fundamental_executor, FUNDAMENTAL_TIMEOUT, fetch_fundamental_data, stock_id),
+        stock_news(ctx.stock_name),
+    )
+    ctx.preload(price_data=price_data, fundamental_data=fundamental_data, news=news)
+    # 查無股價且確認為無效代號時不呼叫 GPT
+    if price_data is None and is_unknown_symbol(stock_id):
+        return [TextMessage(text=UNKNOWN_SYMBOL_MESSAGE.format(stock_id))]
+
+    charts, gpt_report = await asyncio.gather(
+        asyncio.gather(
+            run_blocking(fetch_executor, REPORT_DEADLINE, ctx.price_chart),
+            run_blocking(fetch_executor, REPORT_DEADLINE, ctx.eps_chart),
+        ),
+        stock_gpt_analysis(ctx),
+    )
+    return report_messages(stock_id, gpt_report, charts)
+
+
+# 報價、圖表等快速指令沿用同步版的產生函式，在執行緒池中執行
+async def build_quick(command, stock_id):
+    deadline = Deadline(QUOTE_DEADLINE)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(fetch_executor, COMMANDS[command], stock_id, deadline)
+
+
+# 執行報告並推播給所有等待同一份報告的使用者；
+# 超過截止時間時取消所有尚未完成的階段，改為推播逾時通知
+async def generate_report(stock_id, key, command="report"):
+    try:
+        if command == "report":
+            messages = await asyncio.wait_for(build_report(stock_id), REPORT_DEADLINE)
+        else:
+            messages = await asyncio.wait_for(build_quick(command, stock_id), QUOTE_DEADLINE)
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        print(f"{stock_id} 工作逾時")
+        messages = [TextMessage(text=TIMEOUT_MESSAGE)]
+    except Exception as e:
+        print(f"生成報告失敗: {str(e)}")
+        messages = [TextMessage(text=REPORT_FAILED_MESSAGE)]
+
+    user_ids = release_waiters(in_flight.pop(key, []))
+    print(f"報告推播給 {len(user_ids)} 位使用者")
+    for user_id in user_ids:
+        try:
+            await app.line_bot_api.push_message(PushMessageRequest(to=user_id, messages=messages))
+        except Exception as e:
+            print(f"推播報告失敗 ({user_id}): {str(e)}")
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5000)
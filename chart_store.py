@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+# 圖表 PNG 的記憶體快取：以圖表 id 為 key、依總位元組數上限做 LRU 淘汰。
+# 設定 spill_dir 時同時寫入磁碟，記憶體淘汰後或由其他行程（worker.py、
+# 其他 gunicorn worker）產生的圖表仍可從磁碟讀回。
+# 圖表 id 依內容而定，每天都會產生新檔案，磁碟上的圖檔超過 spill_max_age 秒即刪除，
+# 總大小超過 spill_max_bytes 時再從最舊的開始刪除；每隔 prune_interval 秒檢查一次
+class ChartStore:
+    def __init__(self, max_bytes=64 * 1024 * 1024, spill_dir=None, name="chart",
+                 spill_max_bytes=512 * 1024 * 1024, spill_max_age=7 * 86400, prune_interval=600):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir or None
+        self.name = name
+        self.spill_max_bytes = spill_max_bytes
+        self.spill_max_age = spill_max_age
+        self.prune_interval = prune_interval
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._spill_hits = 0
+        self._misses = 0
+        self._pruned = 0
+        self._next_prune = 0.0
+
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+
+    def get(self, chart_id):
+        with self._lock:
+            png = self._data.get(chart_id)
+            if png is not None:
+                self._data.move_to_end(chart_id)
+                self._hits += 1
+                return png
+
+        png = self._read_spill(chart_id)
+        with self._lock:
+            if png is None:
+                self._misses += 1
+                return None
+            self._spill_hits += 1
+            self._insert(chart_id, png)
+        return png
+
+    def put(self, chart_id, png):
+        with self._lock:
+            self._insert(chart_id, png)
+        self._write_spill(chart_id, png)
+
+    def _insert(self, chart_id, png):
+        old = self._data.pop(chart_id, None)
+        if old is not None:
+            self._bytes -= len(old)
+        if len(png) > self.max_bytes:
+            return
+        self._data[chart_id] = png
+        self._bytes += len(png)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _spill_path(self, chart_id):
+        return os.path.join(self.spill_dir, chart_id)
+
+    def _read_spill(self, chart_id):
+        if not self.spill_dir:
+            return None
+        try:
+            with open(self._spill_path(chart_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # 先寫入暫存檔再改名，讀取端不會看到寫到一半的檔案
+    def _write_spill(self, chart_id, png):
+        if not self.spill_dir:
+            return
+        path = self._spill_path(chart_id)
+        if os.path.exists(path):
+            return
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[{self.name}] 圖表寫入磁碟失敗: {str(e)}")
+        self._maybe_prune()
+
+    # 每隔 prune_interval 秒由其中一個寫入的執行緒清理磁碟；多個行程共用目錄時各自清理，
+    # 刪除已被其他行程刪掉的檔案不視為錯誤
+    def _maybe_prune(self):
+        now = time.time()
+        with self._lock:
+            if now < self._next_prune:
+                return
+            self._next_prune = now + self.prune_interval
+        self.prune_spill(now)
+
+    # 刪除超過保存期限的圖檔，剩餘總大小仍超過上限時從最舊的開始刪除；回傳刪除筆數
+    def prune_spill(self, now=None):
+        if not self.spill_dir:
+            return 0
+        now = now or time.time()
+        files = []
+        with os.scandir(self.spill_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".png"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, path in files:
+            if now - mtime <= self.spill_max_age and total <= self.spill_max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        if removed:
+            print(f"[{self.name}] 刪除 {removed} 個磁碟上的舊圖檔")
+            with self._lock:
+                self._pruned += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            total = self._hits + self._spill_hits + self._misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "spill_dir": self.spill_dir,
+                "spill_pruned": self._pruned,
+                "hits": self._hits,
+                "spill_hits": self._spill_hits,
+                "misses": self._misses,
+                "hit_rate": round((self._hits + self._spill_hits) / total, 3) if total else 0.0,
+            }
@@ -0,0 +1,142 @@
+import io
+import threading
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+# 圖表繪製：只使用 matplotlib.figure.Figure 搭配 Agg canvas，不經過 pyplot 全域狀態，
+# 輸入為精簡的陣列、輸出為 PNG bytes，可在子行程中執行。
+# 字型、格線、標籤等設定好的圖表樣板每個執行緒各保留一份，每次繪圖只替換資料。
+# 每次繪圖回傳 (原圖 PNG, 預覽圖 PNG)，預覽圖供 LINE 聊天室縮圖使用
+
+# 圖表樣式版本，樣式改變時遞增，讓以內容雜湊命名的舊圖檔失效
+CHART_VERSION = 2
+
+# 預覽圖最大寬高與調色盤顏色數
+PREVIEW_SIZE = (240, 240)
+PREVIEW_COLORS = 64
+
+# 股價圖疊加的技術指標：指標名稱、圖例、線條樣式
+PRICE_OVERLAYS = (
+    ("ma20", "MA20", {"color": "tab:orange", "linewidth": 1.0}),
+    ("ma60", "MA60", {"color": "tab:green", "linewidth": 1.0}),
+    ("bb_upper", "Bollinger (20, 2)", {"color": "tab:gray", "linewidth": 0.8, "linestyle": "--"}),
+    ("bb_lower", None, {"color": "tab:gray", "linewidth": 0.8, "linestyle": "--"}),
+)
+
+
+# 股價走勢圖樣板：收盤價與指標折線物件只建立一次，之後以 set_data 更新；
+# 布林通道的填色每次重畫
+class PriceChartTemplate:
+    def __init__(self):
+        self.fig = Figure(figsize=(10, 5))
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.subplots()
+        self.ax.xaxis_date()
+        self.ax.set_xlabel("日期")
+        self.ax.set_ylabel("價格 (TWD)")
+        self.ax.grid(True)
+        empty = np.array([], dtype="datetime64[D]")
+        (self.close_line,) = self.ax.plot(empty, [], label='Closing Price')
+        self.overlay_lines = {
+            name: self.ax.plot(empty, [], label=label or "_nolegend_", **style)[0]
+            for name, label, style in PRICE_OVERLAYS
+        }
+        self.band = None
+
+    # dates 為 datetime64 陣列，closes 為收盤價陣列，overlays 為 指標名稱 -> 與 dates 等長的陣列
+    def render(self, title, dates, closes, overlays=None):
+        overlays = overlays or {}
+        self.close_line.set_data(dates, closes)
+        for name, line in self.overlay_lines.items():
+            values = overlays.get(name)
+            line.set_visible(values is not None)
+            if values is not None:
+                line.set_data(dates, values)
+
+        if self.band is not None:
+            self.band.remove()
+            self.band = None
+        if "bb_upper" in overlays and "bb_lower" in overlays:
+            self.band = self.ax.fill_between(
+                dates, overlays["bb_lower"], overlays["bb_upper"], color="tab:gray", alpha=0.1, linewidth=0
+            )
+
+        handles = [self.close_line] + [
+            line for line in self.overlay_lines.values()
+            if line.get_visible() and not line.get_label().startswith("_")
+        ]
+        self.ax.legend(handles=handles, loc="upper left")
+        self.ax.set_title(title)
+        self.ax.relim(visible_only=True)
+        self.ax.autoscale_view()
+        return _encode(self.fig)
+
+
+# EPS 成長圖樣板：長條圖每次重畫，以數值座標加刻度標籤避免類別軸累積舊的季度
+class EPSChartTemplate:
+    def __init__(self):
+        self.fig = Figure(figsize=(10, 5))
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.subplots()
+        self.ax.set_xlabel("季度")
+        self.ax.set_ylabel("EPS")
+        self.ax.grid(True)
+
+    # labels 為季度字串，values 為 EPS
+    def render(self, title, labels, values):
+        for container in list(self.ax.containers):
+            container.remove()
+        positions = np.arange(len(labels))
+        self.ax.bar(positions, values, color="C0")
+        self.ax.set_xticks(positions, labels)
+        self.ax.set_title(title)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        return _encode(self.fig)
+
+
+# 每個執行緒各自持有樣板，同一個樣板不會被兩個執行緒同時使用
+class ChartRenderer:
+    def __init__(self):
+        self._local = threading.local()
+
+    def _template(self, name, factory):
+        template = getattr(self._local, name, None)
+        if template is None:
+            template = factory()
+            setattr(self._local, name, template)
+        return template
+
+    def price_png(self, title, dates, closes, overlays=None):
+        return self._template("price", PriceChartTemplate).render(title, dates, closes, overlays)
+
+    def eps_png(self, title, labels, values):
+        return self._template("eps", EPSChartTemplate).render(title, labels, values)
+
+
+renderer = ChartRenderer()
+
+
+# 模組層級函式供行程池以名稱呼叫（可被 pickle）
+def render_price_png(title, dates, closes, overlays=None):
+    return renderer.price_png(title, dates, closes, overlays)
+
+
+def render_eps_png(title, labels, values):
+    return renderer.eps_png(title, labels, values)
+
+
+# 輸出原圖 PNG，並由同一份 Agg 畫布縮小、轉為調色盤 PNG 作為預覽圖
+def _encode(fig):
+    buf = io.BytesIO()
+    fig.canvas.print_png(buf)
+
+    image = Image.frombuffer("RGBA", fig.canvas.get_width_height(), fig.canvas.buffer_rgba(), "raw", "RGBA", 0, 1)
+    image = image.convert("RGB")
+    image.thumbnail(PREVIEW_SIZE, Image.LANCZOS)
+    preview = io.BytesIO()
+    image.quantize(PREVIEW_COLORS).save(preview, format="PNG", optimize=True)
+    return buf.getvalue(), preview.getvalue()
@@ -0,0 +1,36 @@
+import time
+
+
+# 超過截止時間時由各階段拋出
+class DeadlineExceeded(Exception):
+    pass
+
+
+# 工作的整體截止時間，以 time.monotonic() 計算，從 handle_message 一路傳到各階段
+class Deadline:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    # 由牆上時間（例如 SQLite 工作的 created_at）換算截止時間
+    @classmethod
+    def from_timestamp(cls, started_at, seconds):
+        deadline = cls(seconds)
+        deadline.expires_at -= time.time() - started_at
+        return deadline
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    # 取得可等待的秒數：不超過剩餘時間，也不超過單一來源的上限
+    def timeout(self, cap=None):
+        remaining = self.remaining()
+        return remaining if cap is None else min(remaining, cap)
+
+    # 已超過截止時間就中止目前階段
+    def check(self, stage):
+        if self.expired():
+            raise DeadlineExceeded(f"{stage} 超過截止時間 ({self.seconds:.0f}s)")
@@ -0,0 +1,63 @@
+import json
+import sqlite3
+import time
+
+import pandas as pd
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fundamentals (
+    symbol TEXT PRIMARY KEY,
+    eps TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+# 基本面（各季 EPS）的持久化快取（SQLite），記錄每檔股票最後一次向 Yahoo 取得的時間
+class FundamentalsStore:
+    def __init__(self, path="fundamentals.db"):
+        self.path = path
+        self._hits = 0
+        self._misses = 0
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # 回傳 (eps, fetched_at)，沒有資料時回傳 None；eps 為以季度日期為索引的 Series
+    def get(self, symbol):
+        with self._connect() as conn:
+            row = conn.execute("SELECT eps, fetched_at FROM fundamentals WHERE symbol = ?", (symbol,)).fetchone()
+        if row is None:
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        data = json.loads(row[0])
+        eps = pd.Series(data, dtype="float64", name="Basic EPS")
+        eps.index = pd.DatetimeIndex(pd.to_datetime(list(data.keys())))
+        return eps, row[1]
+
+    def put(self, symbol, eps):
+        data = {idx.strftime("%Y-%m-%d"): float(value) for idx, value in eps.items()}
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO fundamentals VALUES (?, ?, ?)",
+                (symbol, json.dumps(data), time.time())
+            )
+
+    def stats(self):
+        with self._connect() as conn:
+            size = conn.execute("SELECT COUNT(*) FROM fundamentals").fetchone()[0]
+        total = self._hits + self._misses
+        return {
+            "path": self.path,
+            "size": size,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,105 @@
+import numpy as np
+
+# 技術指標：輸入為 PriceSeries 的收盤價與成交量陣列，全部以 numpy 向量運算，
+# 不經過 pandas rolling/ewm。資料不足的前段以 NaN 表示
+
+MA_WINDOWS = (5, 20, 60)
+VOLUME_WINDOWS = (5, 20)
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_WINDOW, BOLLINGER_WIDTH = 20, 2.0
+
+# 指數平均分段計算時權重 (1 - alpha) ** -k 的上限，避免溢位
+_EWM_MAX_WEIGHT = 1e100
+
+
+# 簡單移動平均（累加和相減）
+def sma(values, window):
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        csum = np.cumsum(np.concatenate(([0.0], values)))
+        out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+
+# 移動標準差（母體標準差，與布林通道慣例相同）
+def rolling_std(values, window):
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        mean = sma(values, window)[window - 1:]
+        csum2 = np.cumsum(np.concatenate(([0.0], values * values)))
+        var = (csum2[window:] - csum2[:-window]) / window - mean * mean
+        out[window - 1:] = np.sqrt(np.maximum(var, 0.0))
+    return out
+
+
+# 指數移動平均：y[t] = (1 - alpha) * y[t-1] + alpha * x[t]，以第一筆資料為起始值。
+# 每段內以 y[k] = d^k * (y0 + alpha * sum(x[j] / d^j)) 的累加和一次算完
+def ewm(values, alpha):
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty(len(values))
+    if len(values) == 0:
+        return out
+    decay = 1.0 - alpha
+    if decay <= 0:
+        return values.copy()
+    block = max(1, int(np.log(_EWM_MAX_WEIGHT) / -np.log(decay)))
+    prev = values[0]
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        out[start:start + len(chunk)] = powers * (prev + alpha * np.cumsum(chunk / powers))
+        prev = out[start + len(chunk) - 1]
+    return out
+
+
+def ema(values, span):
+    return ewm(values, 2.0 / (span + 1))
+
+
+# RSI（Wilder 平滑，alpha = 1 / period）
+def rsi(close, period=RSI_PERIOD):
+    close = np.asarray(close, dtype=np.float64)
+    out = np.full(len(close), np.nan)
+    if len(close) <= period:
+        return out
+    delta = np.diff(close)
+    gain = ewm(np.maximum(delta, 0.0), 1.0 / period)
+    loss = ewm(np.maximum(-delta, 0.0), 1.0 / period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = np.where(loss == 0, np.where(gain == 0, 50.0, 100.0), 100.0 - 100.0 / (1.0 + gain / loss))
+    out[period:] = value[period - 1:]
+    return out
+
+
+# 一次計算所有指標，回傳 指標名稱 -> 與輸入等長的 float64 陣列
+def compute(close, volume):
+    close = np.asarray(close, dtype=np.float64)
+    volume = np.asarray(volume, dtype=np.float64)
+
+    result = {f"ma{n}": sma(close, n) for n in MA_WINDOWS}
+    result.update({f"volume_ma{n}": sma(volume, n) for n in VOLUME_WINDOWS})
+    result["rsi"] = rsi(close)
+
+    macd = ema(close, MACD_FAST) - ema(close, MACD_SLOW)
+    signal = ema(macd, MACD_SIGNAL)
+    result["macd"] = macd
+    result["macd_signal"] = signal
+    result["macd_hist"] = macd - signal
+
+    middle = sma(close, BOLLINGER_WINDOW)
+    width = BOLLINGER_WIDTH * rolling_std(close, BOLLINGER_WINDOW)
+    result["bb_middle"] = middle
+    result["bb_upper"] = middle + width
+    result["bb_lower"] = middle - width
+    return result
+
+
+# 各指標最新一筆數值（資料不足時為 None）
+def latest(result):
+    return {
+        name: (None if len(values) == 0 or np.isnan(values[-1]) else float(values[-1]))
+        for name, values in result.items()
+    }
@@ -0,0 +1,217 @@
+import json
+import sqlite3
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL,
+    stock_id TEXT NOT NULL,
+    user_ids TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    claimed_by TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_available ON jobs (status, available_at);
+CREATE INDEX IF NOT EXISTS jobs_key_status ON jobs (key, status);
+"""
+
+
+# 持久化的報告工作佇列（SQLite）
+# 狀態流程：queued -> running -> done / failed
+# running 的工作帶有租約 (available_at)，worker 當掉時租約過期後會被重新領取
+class JobQueue:
+    def __init__(self, path="jobs.db", visibility_timeout=120, max_attempts=3, retry_delay=10, max_pending=200):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_pending = max_pending
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # 每次操作使用獨立連線，web 與 worker 不同行程也能安全共用同一個檔案
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # 加入工作；同一 key 已在排隊或執行中時只追加使用者
+    # 回傳 job id，佇列已滿時回傳 None
+    def enqueue(self, key, stock_id, user_id):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, user_ids FROM jobs WHERE key = ? AND status IN ('queued', 'running') "
+                "ORDER BY id LIMIT 1",
+                (key,)
+            ).fetchone()
+            if row is not None:
+                user_ids = json.loads(row["user_ids"])
+                if user_id not in user_ids:
+                    user_ids.append(user_id)
+                conn.execute(
+                    "UPDATE jobs SET user_ids = ?, updated_at = ? WHERE id = ?",
+                    (json.dumps(user_ids), now, row["id"])
+                )
+                conn.execute("COMMIT")
+                return row["id"]
+
+            pending = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if pending >= self.max_pending:
+                conn.execute("ROLLBACK")
+                return None
+
+            cursor = conn.execute(
+                "INSERT INTO jobs (key, stock_id, user_ids, status, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (key, stock_id, json.dumps([user_id]), now, now, now)
+            )
+            conn.execute("COMMIT")
+            return cursor.lastrowid
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # 領取一筆可執行的工作（排隊中，或租約已過期的執行中工作）
+    def claim(self, worker_id):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') AND available_at <= ? "
+                "AND attempts < ? ORDER BY available_at, id LIMIT 1",
+                (now, self.max_attempts)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, available_at = ?, "
+                "claimed_by = ?, updated_at = ? WHERE id = ?",
+                (now + self.visibility_timeout, worker_id, now, row["id"])
+            )
+            conn.execute("COMMIT")
+            job = dict(row)
+            job.update(status="running", attempts=job["attempts"] + 1, claimed_by=worker_id)
+            job["user_ids"] = json.loads(job["user_ids"])
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # 工作完成：標記 done 並回傳最新的使用者名單（執行期間可能有人加入）。
+    # 只有目前仍持有租約的 worker（claimed_by 與 attempts 相同）可以結束工作；
+    # 租約過期、工作已被其他 worker 重新領取時回傳 None，由新的 worker 負責推播
+    def complete(self, job):
+        return self._finish(job, "done", None)
+
+    # 工作失敗：還有重試次數就延後重新排隊，否則標記 failed 並回傳使用者名單；
+    # 已失去租約時同樣回傳 None
+    def fail(self, job, error):
+        if job["attempts"] >= self.max_attempts:
+            return self._finish(job, "failed", error)
+
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', available_at = ?, error = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND claimed_by = ? AND attempts = ?",
+                (now + self.retry_delay * job["attempts"], error, now, job["id"], job["claimed_by"], job["attempts"])
+            )
+            return [] if cursor.rowcount else None
+        finally:
+            conn.close()
+
+    def _finish(self, job, status, error):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'running' AND claimed_by = ? AND attempts = ?",
+                (status, error, now, job["id"], job["claimed_by"], job["attempts"])
+            )
+            if cursor.rowcount == 0:
+                conn.execute("COMMIT")
+                return None
+            row = conn.execute("SELECT user_ids FROM jobs WHERE id = ?", (job["id"],)).fetchone()
+            conn.execute("COMMIT")
+            return json.loads(row["user_ids"])
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # 租約過期且重試次數用完的工作標記為 failed，回傳這些工作以便通知使用者
+    def reap_expired(self):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'running' AND available_at <= ? AND attempts >= ?",
+                (now, self.max_attempts)
+            ).fetchall()
+            for row in rows:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = 'visibility timeout', updated_at = ? WHERE id = ?",
+                    (now, row["id"])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        jobs = [dict(row) for row in rows]
+        for job in jobs:
+            job["user_ids"] = json.loads(job["user_ids"])
+        return jobs
+
+    # 刪除完成或失敗超過 retention 秒的工作，避免資料庫無限成長；回傳刪除筆數
+    def purge(self, retention):
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?",
+                (time.time() - retention,)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        finally:
+            conn.close()
+        return {
+            "path": self.path,
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_wait_seconds": round(time.time() - oldest, 3) if oldest else 0.0,
+        }
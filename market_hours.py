@@ -0,0 +1,80 @@
+import datetime as dt
+import os
+from zoneinfo import ZoneInfo
+
+# 台灣證券交易所交易時段（台北時間）
+TAIPEI = ZoneInfo("Asia/Taipei")
+MARKET_OPEN = dt.time(9, 0)
+MARKET_CLOSE = dt.time(13, 30)
+
+# 休市日（國定假日等），以逗號分隔的 YYYY-MM-DD，週末自動視為休市
+TWSE_HOLIDAYS = {
+    dt.date.fromisoformat(d.strip())
+    for d in os.getenv("TWSE_HOLIDAYS", "").split(",")
+    if d.strip()
+}
+
+
+def now_taipei():
+    return dt.datetime.now(TAIPEI)
+
+
+def is_trading_day(day):
+    return day.weekday() < 5 and day not in TWSE_HOLIDAYS
+
+
+def is_market_open(now=None):
+    now = now or now_taipei()
+    return is_trading_day(now.date()) and MARKET_OPEN <= now.time() < MARKET_CLOSE
+
+
+# 下一個交易時段的開盤時間（若現在正在盤中則回傳下一個交易日的開盤）
+def next_session_open(now=None):
+    now = now or now_taipei()
+    day = now.date()
+    if now.time() >= MARKET_OPEN:
+        day += dt.timedelta(days=1)
+    while not is_trading_day(day):
+        day += dt.timedelta(days=1)
+    return dt.datetime.combine(day, MARKET_OPEN, tzinfo=TAIPEI)
+
+
+# 日K已定案的截止日（不含）：交易日收盤前今日的日K還會變動，截止於今日；
+# 收盤後與休市日包含今日
+def settled_end(now=None):
+    now = now or now_taipei()
+    day = now.date()
+    if is_trading_day(day) and now.time() < MARKET_CLOSE:
+        return day
+    return day + dt.timedelta(days=1)
+
+
+# 行情資料的有效秒數：盤中使用短 TTL，收盤後到下一個交易時段開盤前都有效。
+# intraday 為 False 表示資料不含今日盤中的日K，盤中也要到收盤才會變動
+def price_ttl(open_ttl, now=None, intraday=True):
+    now = now or now_taipei()
+    if is_market_open(now):
+        if intraday:
+            return open_ttl
+        close = dt.datetime.combine(now.date(), MARKET_CLOSE, tzinfo=TAIPEI)
+        return max(open_ttl, (close - now).total_seconds())
+    return max(open_ttl, (next_session_open(now) - now).total_seconds())
+
+
+# 財報公告期間（月, 日）起訖：年報 3/31、Q1 5/15、Q2 8/14、Q3 11/14 截止前的數週
+EARNINGS_WINDOWS = [
+    ((3, 1), (3, 31)),
+    ((4, 20), (5, 15)),
+    ((7, 20), (8, 14)),
+    ((10, 20), (11, 14)),
+]
+
+
+def in_earnings_season(day):
+    return any(start <= (day.month, day.day) <= end for start, end in EARNINGS_WINDOWS)
+
+
+# 基本面資料的有效秒數：財報公告期間縮短，其餘時間使用長 TTL
+def fundamental_ttl(long_ttl, earnings_ttl, now=None):
+    now = now or now_taipei()
+    return earnings_ttl if in_earnings_season(now.date()) else long_ttl
@@ -0,0 +1,148 @@
+import datetime as dt
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from price_series import EPOCH, PriceSeries
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT NOT NULL,
+    date TEXT NOT NULL,
+    open REAL,
+    high REAL,
+    low REAL,
+    close REAL,
+    volume INTEGER,
+    PRIMARY KEY (symbol, date)
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    symbol TEXT PRIMARY KEY,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL
+);
+"""
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# 資料格式版本：1 起改存未還原權值的股價，舊版（還原股價）的資料全部清除重抓
+SCHEMA_VERSION = 1
+
+
+# 本機日K資料庫（SQLite）：記錄每檔股票已下載過的日期區間 (coverage)，
+# 之後只向 yfinance 補抓區間外的部分，任意長度的區間都從資料庫讀出。
+# 資料庫保存完整 OHLCV，讀出時只取日期、收盤價與成交量組成 PriceSeries
+class OHLCVStore:
+    def __init__(self, path="ohlcv.db"):
+        self.path = path
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                conn.execute("DELETE FROM bars")
+                conn.execute("DELETE FROM coverage")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # 同一檔股票的補抓一次只做一次，避免重複下載
+    def _symbol_lock(self, symbol):
+        with self._locks_lock:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def coverage(self, symbol):
+        with self._connect() as conn:
+            row = conn.execute("SELECT start, end FROM coverage WHERE symbol = ?", (symbol,)).fetchone()
+        if row is None:
+            return None
+        return dt.date.fromisoformat(row[0]), dt.date.fromisoformat(row[1])
+
+    # 取得 [start, end) 區間的日K，缺少的部分透過 download(start, end) 補抓後寫入。
+    # settled 為日K已定案的截止日（不含），之後的日K（盤中的今日）照常寫入與讀出，
+    # 但不記為已抓取，下次會重新下載更新
+    def get(self, symbol, start, end, download, settled=None):
+        with self._symbol_lock(symbol):
+            covered = self.coverage(symbol)
+            if covered is None:
+                missing = [(start, end)]
+            else:
+                covered_start, covered_end = covered
+                missing = []
+                if start < covered_start:
+                    missing.append((start, covered_start))
+                if covered_end < end:
+                    missing.append((covered_end, end))
+
+            for fetch_start, fetch_end in missing:
+                bars = download(fetch_start, fetch_end)
+                if bars.empty and covered is None:
+                    # 從未取得過資料（可能是無效代號），不記錄區間
+                    return PriceSeries.empty()
+                last = self._append(symbol, bars)
+                print(f"{symbol} 補抓日K {fetch_start} ~ {fetch_end}，共 {len(bars)} 筆")
+
+                # yfinance 限流、逾時或網路錯誤時回傳空資料而非拋出例外，區間只記錄到實際取得的最後一筆；
+                # 已有資料之前的區間（上市前或長假）是已結束的過去，空資料也可以記為已抓取
+                if covered is not None and fetch_end <= covered[0]:
+                    covered = self._extend(symbol, covered, fetch_start, fetch_end)
+                elif last is not None:
+                    fetched_end = min(fetch_end, last + dt.timedelta(days=1))
+                    if settled is not None:
+                        fetched_end = min(fetched_end, settled)
+                    if fetched_end > fetch_start:
+                        covered = self._extend(symbol, covered, fetch_start, fetched_end)
+
+        return self.load(symbol, start, end)
+
+    def load(self, symbol, start, end):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT date, close, volume FROM bars "
+                "WHERE symbol = ? AND date >= ? AND date < ? ORDER BY date",
+                (symbol, start.isoformat(), end.isoformat())
+            ).fetchall()
+        if not rows:
+            return PriceSeries.empty()
+
+        dates, close, volume = zip(*rows)
+        days = (np.array(dates, dtype="datetime64[D]") - EPOCH).astype(np.int32)
+        return PriceSeries(days, close, volume)
+
+    # 寫入日K，回傳實際寫入的最後一個日期（沒有資料時為 None）
+    def _append(self, symbol, bars):
+        if bars.empty:
+            return None
+        if isinstance(bars.columns, pd.MultiIndex):
+            bars = bars.copy()
+            bars.columns = bars.columns.get_level_values(0)
+
+        records = [
+            (
+                symbol, idx.strftime("%Y-%m-%d"),
+                float(row["Open"]), float(row["High"]), float(row["Low"]), float(row["Close"]),
+                int(row["Volume"]),
+            )
+            for idx, row in bars[COLUMNS].dropna().iterrows()
+        ]
+        if not records:
+            return None
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+        return dt.date.fromisoformat(records[-1][1])
+
+    def _extend(self, symbol, covered, start, end):
+        if covered is not None:
+            start, end = min(start, covered[0]), max(end, covered[1])
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?)",
+                (symbol, start.isoformat(), end.isoformat())
+            )
+        return start, end
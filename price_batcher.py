@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pandas as pd
+
+
+# 同一個下載區間的一批股票
+class _Batch:
+    __slots__ = ("symbols", "closed", "done", "results", "error")
+
+    def __init__(self):
+        self.symbols = []
+        self.closed = False
+        self.done = threading.Event()
+        self.results = {}
+        self.error = None
+
+
+# 把短時間內、相同區間的股價請求合併成一次多檔 yf.download，再依股票拆回各自的結果
+# download(symbols, start, end, timeout) 需回傳 yfinance 格式的 DataFrame
+class PriceBatcher:
+    def __init__(self, download, window=0.05, max_batch=20):
+        self.download = download
+        self.window = window
+        self.max_batch = max_batch
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._batches = 0
+        self._requests = 0
+
+    # 單一股票的請求：第一位請求者等待 window 秒收集同區間的其他股票後負責下載
+    def fetch(self, symbol, start, end, timeout=None):
+        key = (start, end)
+        with self._lock:
+            self._requests += 1
+            batch = self._pending.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._pending[key] = _Batch()
+            if symbol not in batch.symbols:
+                batch.symbols.append(symbol)
+            if len(batch.symbols) >= self.max_batch:
+                self._close(key, batch)
+
+        if leader:
+            time.sleep(self.window)
+            with self._lock:
+                self._close(key, batch)
+            self._run(batch, start, end, timeout)
+        elif not batch.done.wait(None if timeout is None else timeout + self.window):
+            raise TimeoutError(f"{symbol} 批次下載逾時")
+
+        if batch.error is not None:
+            raise batch.error
+        return batch.results.get(symbol, empty_frame())
+
+    def _close(self, key, batch):
+        batch.closed = True
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+
+    def _run(self, batch, start, end, timeout):
+        with self._lock:
+            self._batches += 1
+        try:
+            frame = self.download(batch.symbols, start, end, timeout)
+            batch.results = split_frame(frame, batch.symbols)
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "batches": self._batches,
+                "avg_batch_size": round(self._requests / self._batches, 2) if self._batches else 0.0,
+                "pending": len(self._pending),
+            }
+
+
+def empty_frame():
+    return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"])
+
+
+# 拆開多檔下載的結果：欄位為 (欄位, 股票) 的 MultiIndex，
+# 舊版 yfinance 單檔下載則是單層欄位
+def split_frame(frame, symbols):
+    if frame is None or frame.empty:
+        return {}
+    if not isinstance(frame.columns, pd.MultiIndex):
+        return {symbols[0]: frame} if len(symbols) == 1 else {}
+
+    level = 1 if set(symbols) & set(frame.columns.get_level_values(1)) else 0
+    results = {}
+    for symbol in symbols:
+        if symbol not in frame.columns.get_level_values(level):
+            continue
+        part = frame.xs(symbol, axis=1, level=level).dropna(how="all")
+        if not part.empty:
+            results[symbol] = part
+    return results
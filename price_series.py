@@ -0,0 +1,35 @@
+import numpy as np
+
+EPOCH = np.datetime64("1970-01-01", "D")
+
+
+# 精簡的欄式股價資料：int32 日期（距 1970-01-01 天數）、float32 收盤價、int64 成交量，
+# 由舊到新排序
+class PriceSeries:
+    __slots__ = ("days", "close", "volume")
+
+    def __init__(self, days, close, volume):
+        self.days = np.asarray(days, dtype=np.int32)
+        self.close = np.asarray(close, dtype=np.float32)
+        self.volume = np.asarray(volume, dtype=np.int64)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, np.int32), np.empty(0, np.float32), np.empty(0, np.int64))
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def dates(self):
+        return EPOCH + self.days.astype("timedelta64[D]")
+
+    def date_str(self, i):
+        return str(self.dates[i])
+
+    # 第一筆日期不早於 day (datetime.date) 的位置
+    def start_index(self, day):
+        return int(np.searchsorted(self.days, (np.datetime64(day, "D") - EPOCH).astype(np.int32)))
+
+    def tail(self, n):
+        return PriceSeries(self.days[-n:], self.close[-n:], self.volume[-n:])
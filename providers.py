@@ -0,0 +1,116 @@
+import os
+import time
+
+import pandas as pd
+import yfinance as yf
+
+
+# 行情資料來源介面：股價歷史與季度財報
+# price_history 回傳 yfinance 多檔下載格式（欄位為 (欄位, 股票) 的 MultiIndex）的日K，
+# quarterly_financials 回傳以項目為列、季度日期為欄的財報
+class MarketDataProvider:
+    name = "base"
+
+    def price_history(self, symbols, start, end, timeout=None):
+        raise NotImplementedError
+
+    def quarterly_financials(self, symbol):
+        raise NotImplementedError
+
+
+# 預設來源：Yahoo Finance
+# 使用未還原權值的收盤價 (auto_adjust=False)：還原股價在每次除權息後整段重算，
+# 與日K資料庫中先前存下的舊區間基準不同，拼接後會在除權息日附近出現假的跳空
+class YFinanceProvider(MarketDataProvider):
+    name = "yfinance"
+
+    def price_history(self, symbols, start, end, timeout=None):
+        return yf.download(
+            symbols, start=start, end=end, timeout=timeout or 10, group_by="column", progress=False,
+            auto_adjust=False
+        )
+
+    def quarterly_financials(self, symbol):
+        return yf.Ticker(symbol).quarterly_financials
+
+
+# 離線來源：從目錄讀取錄製好的資料，並可模擬上游延遲，用於可重現的效能測試
+#   {directory}/prices/{symbol}.csv      Date,Open,High,Low,Close,Volume
+#   {directory}/financials/{symbol}.csv  第一欄為項目名稱，其餘欄為季度日期
+class FixtureProvider(MarketDataProvider):
+    name = "fixture"
+
+    def __init__(self, directory, latency=0.0):
+        self.directory = directory
+        self.latency = latency
+
+    def _path(self, kind, symbol):
+        return os.path.join(self.directory, kind, f"{symbol}.csv")
+
+    def price_history(self, symbols, start, end, timeout=None):
+        time.sleep(self.latency)
+        frames = {}
+        for symbol in symbols:
+            path = self._path("prices", symbol)
+            if not os.path.exists(path):
+                continue
+            frame = pd.read_csv(path, index_col="Date", parse_dates=["Date"])
+            frame = frame[(frame.index >= pd.Timestamp(start)) & (frame.index < pd.Timestamp(end))]
+            if not frame.empty:
+                frames[symbol] = frame
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1, names=["Ticker", "Price"]).swaplevel(axis=1).sort_index(axis=1)
+
+    def quarterly_financials(self, symbol):
+        time.sleep(self.latency)
+        path = self._path("financials", symbol)
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        frame = pd.read_csv(path, index_col=0)
+        frame.columns = pd.to_datetime(frame.columns)
+        return frame
+
+
+# 錄製來源：轉呼叫另一個來源，並把結果存成 FixtureProvider 可讀取的檔案
+class RecordingProvider(MarketDataProvider):
+    name = "recording"
+
+    def __init__(self, inner, directory):
+        self.inner = inner
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "prices"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "financials"), exist_ok=True)
+
+    def price_history(self, symbols, start, end, timeout=None):
+        frame = self.inner.price_history(symbols, start, end, timeout)
+        if frame is not None and not frame.empty and isinstance(frame.columns, pd.MultiIndex):
+            for symbol in frame.columns.get_level_values(1).unique():
+                part = frame.xs(symbol, axis=1, level=1).dropna(how="all")
+                path = os.path.join(self.directory, "prices", f"{symbol}.csv")
+                if os.path.exists(path):
+                    previous = pd.read_csv(path, index_col="Date", parse_dates=["Date"])
+                    part = pd.concat([previous, part])
+                    part = part[~part.index.duplicated(keep="last")].sort_index()
+                part.to_csv(path, index_label="Date")
+        return frame
+
+    def quarterly_financials(self, symbol):
+        frame = self.inner.quarterly_financials(symbol)
+        if frame is not None and not frame.empty:
+            frame.to_csv(os.path.join(self.directory, "financials", f"{symbol}.csv"))
+        return frame
+
+
+# 依設定建立資料來源：yfinance（預設）或 fixture；指定 record_dir 時同時錄製
+def create_provider(name="yfinance", fixture_dir="fixtures", latency=0.0, record_dir=None):
+    if name == "fixture":
+        provider = FixtureProvider(fixture_dir, latency)
+    elif name == "yfinance":
+        provider = YFinanceProvider()
+    else:
+        raise ValueError(f"未知的行情資料來源: {name}")
+
+    if record_dir:
+        provider = RecordingProvider(provider, record_dir)
+    return provider
@@ -0,0 +1,95 @@
+import itertools
+import threading
+import time
+
+
+# Token bucket：每秒補充 rate 個 token，最多累積 capacity 個
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        return self.tokens
+
+    def full(self, now):
+        return self.tokens + (now - self.updated_at) * self.rate >= self.capacity
+
+
+# 依來源（使用者、群組、聊天室）限制請求速率與同時進行中的工作數
+class SourceLimiter:
+    def __init__(self, rate=0.2, burst=3, max_in_flight=2):
+        self.rate = rate
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._in_flight = {}
+        self._holds = {}
+        self._hold_ids = itertools.count(1)
+        self._limited = 0
+        self._busy = 0
+
+    # 每個請求各自的名額憑證。工作 key（如 report:2330:90）在前一份工作結束前就可能被新工作重複使用，
+    # 名額若掛在工作 key 底下，舊工作的 release 會一併釋放新工作的名額
+    def new_hold(self):
+        return next(self._hold_ids)
+
+    # 一次檢查所有來源並佔用名額，名額掛在 hold 底下直到 release(hold)
+    # 回傳 None 表示通過，否則回傳被拒絕的原因 ("in_flight" / "rate")
+    def acquire(self, source_keys, hold):
+        now = time.monotonic()
+        with self._lock:
+            if any(self._in_flight.get(k, 0) >= self.max_in_flight for k in source_keys):
+                self._busy += 1
+                return "in_flight"
+
+            buckets = []
+            for k in source_keys:
+                bucket = self._buckets.get(k)
+                if bucket is None:
+                    bucket = self._buckets[k] = TokenBucket(self.rate, self.burst)
+                buckets.append(bucket)
+            if any(b.refill(now) < 1 for b in buckets):
+                self._limited += 1
+                return "rate"
+            for b in buckets:
+                b.tokens -= 1
+
+            for k in source_keys:
+                self._in_flight[k] = self._in_flight.get(k, 0) + 1
+            self._holds[hold] = list(source_keys)
+            if len(self._buckets) > 10000:
+                self._prune(now)
+            return None
+
+    # 請求結束（工作完成、被拒絕或被丟棄）時釋放掛在 hold 底下的所有名額
+    def release(self, hold):
+        with self._lock:
+            for k in self._holds.pop(hold, []):
+                count = self._in_flight.get(k, 0) - 1
+                if count > 0:
+                    self._in_flight[k] = count
+                else:
+                    self._in_flight.pop(k, None)
+
+    # 移除已補滿且沒有進行中工作的 bucket，避免記憶體無限成長
+    def _prune(self, now):
+        for key in [k for k, b in self._buckets.items() if b.full(now) and k not in self._in_flight]:
+            del self._buckets[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sources": len(self._buckets),
+                "in_flight": sum(self._in_flight.values()),
+                "rate_limited": self._limited,
+                "in_flight_limited": self._busy,
+            }
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import deque
+
+
+# 佇列中的單一工作
+class _Job:
+    __slots__ = ("fn", "args", "on_drop", "enqueued_at")
+
+    def __init__(self, fn, args, on_drop):
+        self.fn = fn
+        self.args = args
+        self.on_drop = on_drop
+        self.enqueued_at = time.monotonic()
+
+
+# 報告產生工作池：固定數量的 worker 與有上限的佇列
+# 佇列已滿時依 policy 處理：
+#   reject      直接拒絕新工作，由呼叫端回覆「忙碌中」
+#   drop_oldest 丟棄最舊的排隊工作（呼叫其 on_drop），讓新工作排入
+class ReportPool:
+    POLICIES = ("reject", "drop_oldest")
+
+    def __init__(self, workers=4, queue_size=20, policy="reject", name="report"):
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的佇列滿載策略: {policy}")
+        if workers < 1 or queue_size < 1:
+            raise ValueError("workers 與 queue_size 必須大於 0")
+
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.policy = policy
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._running = 0
+
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._dropped = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._last_wait = 0.0
+
+    def _ensure_started(self):
+        # 在第一次送出工作時才啟動 worker，避免 import 時就建立執行緒
+        if self._threads:
+            return
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"{self.name}-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, fn, *args, on_drop=None):
+        dropped = None
+        with self._cond:
+            self._ensure_started()
+            if len(self._queue) >= self.queue_size:
+                if self.policy == "reject":
+                    self._rejected += 1
+                    print(f"[{self.name}] 佇列已滿 ({self.queue_size})，拒絕新工作")
+                    return False
+                dropped = self._queue.popleft()
+                self._dropped += 1
+                print(f"[{self.name}] 佇列已滿 ({self.queue_size})，丟棄最舊的工作")
+
+            self._queue.append(_Job(fn, args, on_drop))
+            self._submitted += 1
+            self._cond.notify()
+
+        if dropped is not None and dropped.on_drop is not None:
+            try:
+                dropped.on_drop()
+            except Exception as e:
+                print(f"[{self.name}] 通知被丟棄的工作失敗: {str(e)}")
+        return True
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job = self._queue.popleft()
+                wait = time.monotonic() - job.enqueued_at
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._last_wait = wait
+                self._running += 1
+
+            try:
+                job.fn(*job.args)
+            except Exception as e:
+                print(f"[{self.name}] 工作執行失敗: {str(e)}")
+                with self._cond:
+                    self._failed += 1
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._completed += 1
+
+    # 佇列深度與等待時間，用來評估每個 instance 需要多少 worker
+    def stats(self):
+        with self._cond:
+            started = self._submitted - len(self._queue) - self._dropped
+            oldest = time.monotonic() - self._queue[0].enqueued_at if self._queue else 0.0
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "policy": self.policy,
+                "queue_depth": len(self._queue),
+                "running": self._running,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "dropped": self._dropped,
+                "wait_avg_seconds": round(self._wait_total / started, 3) if started else 0.0,
+                "wait_max_seconds": round(self._wait_max, 3),
+                "wait_last_seconds": round(self._last_wait, 3),
+                "oldest_wait_seconds": round(oldest, 3),
+            }
@@ -0,0 +1,85 @@
+import bisect
+import csv
+import difflib
+from collections import namedtuple
+
+# 市場對應的 Yahoo 代號後綴：上市 .TW、上櫃 .TWO
+MARKET_SUFFIX = {"TWSE": ".TW", "TPEx": ".TWO"}
+
+Listing = namedtuple("Listing", ["code", "name", "english_name", "market", "symbol"])
+
+
+# 股票代號解析：啟動時由上市櫃清單建立索引，
+# 將代號、中文名稱、英文名稱與常用別名對應到 Yahoo 代號與市場，支援前綴與模糊比對
+class TickerResolver:
+    def __init__(self, listings):
+        self.listings = listings
+        self._codes = {listing.code: listing for listing in listings}
+        self._exact = {}
+        for listing in listings:
+            self._exact[self._normalize(listing.code)] = listing
+            for key in (listing.name, listing.english_name):
+                self._exact.setdefault(self._normalize(key), listing)
+        self._keys = sorted(self._exact)
+
+    @classmethod
+    def from_csv(cls, path):
+        listings = []
+        aliases = []
+        with open(path, encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                listing = Listing(
+                    row["code"], row["name"], row["english_name"], row["market"],
+                    row["code"] + MARKET_SUFFIX[row["market"]]
+                )
+                listings.append(listing)
+                aliases += [(alias, listing) for alias in row["aliases"].split("|") if alias]
+
+        resolver = cls(listings)
+        for alias, listing in aliases:
+            resolver._exact.setdefault(cls._normalize(alias), listing)
+        resolver._keys = sorted(resolver._exact)
+        return resolver
+
+    @staticmethod
+    def _normalize(text):
+        return text.strip().lower()
+
+    # 只以股票代號完全相符查詢（不比對名稱與別名）
+    def by_code(self, code):
+        return self._codes.get(code.strip().upper())
+
+    # 依序嘗試：完全相符、唯一的前綴、模糊比對；找不到時回傳 None
+    def resolve(self, text):
+        key = self._normalize(text)
+        if not key:
+            return None
+
+        listing = self._exact.get(key)
+        if listing is not None:
+            return listing
+
+        # 純數字的代號只接受完全相符，避免 233 或 2331 被當成 2330
+        if key.isdigit():
+            return None
+
+        matches = {listing.code: listing for listing in self.prefix(key)}
+        if len(matches) == 1:
+            return next(iter(matches.values()))
+
+        if len(key) >= 2:
+            close = difflib.get_close_matches(key, self._keys, n=1, cutoff=0.75)
+            if close:
+                return self._exact[close[0]]
+        return None
+
+    # 以前綴查詢（排序後二分搜尋）
+    def prefix(self, text, limit=10):
+        key = self._normalize(text)
+        start = bisect.bisect_left(self._keys, key)
+        results = []
+        for k in self._keys[start:]:
+            if not k.startswith(key) or len(results) >= limit:
+                break
+            results.append(self._exact[k])
+        return results
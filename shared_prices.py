@@ -0,0 +1,169 @@
+import mmap
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows 開發環境沒有 fcntl，只在單一行程內加鎖
+    fcntl = None
+
+
+MAGIC = 0x4C425031
+VERSION = 2
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "<u4"),
+    ("version", "<u4"),
+    ("generation", "<u8"),
+    ("data_used", "<u8"),
+    ("slots_used", "<u4"),
+    ("pad", "<u4"),
+])
+SLOT_DTYPE = np.dtype([
+    ("symbol", "S16"),
+    ("start", "<i4"),
+    ("end", "<i4"),
+    ("expires", "<f8"),
+    ("offset", "<i8"),
+    ("length", "<i4"),
+    ("pad", "<i4"),
+])
+
+
+def default_path():
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "line-bot-prices")
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+# 跨行程共用的股價快取：記憶體映射檔案，gunicorn 的每個 worker 讀到同一份 bytes。
+# 檔案結構：header | 索引 (slots 個固定長度欄位) | 資料區（依序附加）
+# 每筆資料為 int32 日期（距 1970-01-01 天數）、float32 收盤價、int64 成交量三個陣列；
+# 資料區或索引用完時整份清空重來 (generation + 1)
+class SharedPriceStore:
+    def __init__(self, path=None, size=64 * 1024 * 1024, slots=4096):
+        self.path = path or default_path()
+        self.slots = slots
+        self.data_start = _align(HEADER_DTYPE.itemsize + SLOT_DTYPE.itemsize * slots)
+        self.size = max(size, self.data_start + 1024 * 1024)
+
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked(exclusive=True):
+            if os.fstat(self._fd).st_size < self.size:
+                os.ftruncate(self._fd, self.size)
+            self._mm = mmap.mmap(self._fd, self.size)
+            self._header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self._mm)
+            self._index = np.ndarray((slots,), dtype=SLOT_DTYPE, buffer=self._mm, offset=HEADER_DTYPE.itemsize)
+            if self._header["magic"] != MAGIC or self._header["version"] != VERSION:
+                self._reset(generation=0)
+
+    # 行程內用 threading.Lock，行程間用 flock
+    @contextmanager
+    def _locked(self, exclusive):
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _reset(self, generation):
+        self._index[:] = np.zeros(self.slots, dtype=SLOT_DTYPE)
+        self._header["magic"] = MAGIC
+        self._header["version"] = VERSION
+        self._header["generation"] = generation
+        self._header["data_used"] = 0
+        self._header["slots_used"] = 0
+
+    def _find(self, key):
+        used = int(self._header["slots_used"])
+        index = self._index[:used]
+        match = np.nonzero(
+            (index["symbol"] == key[0]) & (index["start"] == key[1]) & (index["end"] == key[2])
+        )[0]
+        return int(match[-1]) if len(match) else None
+
+    @staticmethod
+    def _key(symbol, start, end):
+        return symbol.encode(), _days(start), _days(end)
+
+    # 取得 (dates, close, volume) 三個陣列；沒有或已過期時回傳 None。
+    # 必須在持有鎖時複製出來：其他行程清空重建後會覆寫同一段資料區
+    def get(self, symbol, start, end):
+        key = self._key(symbol, start, end)
+        with self._locked(exclusive=False):
+            slot = self._find(key)
+            if slot is None or self._index[slot]["expires"] <= time.time():
+                self._misses += 1
+                return None
+            offset = int(self._index[slot]["offset"])
+            length = int(self._index[slot]["length"])
+            self._hits += 1
+
+            dates = np.frombuffer(self._mm, dtype="<i4", count=length, offset=offset).copy()
+            offset += _align(4 * length)
+            close = np.frombuffer(self._mm, dtype="<f4", count=length, offset=offset).copy()
+            offset += _align(4 * length)
+            volume = np.frombuffer(self._mm, dtype="<i8", count=length, offset=offset).copy()
+        return dates, close, volume
+
+    def put(self, symbol, start, end, dates, close, volume, ttl):
+        key = self._key(symbol, start, end)
+        length = len(dates)
+        need = 2 * _align(4 * length) + 8 * length
+        if len(key[0]) > SLOT_DTYPE["symbol"].itemsize or self.data_start + need > self.size:
+            return
+
+        with self._locked(exclusive=True):
+            data_used = int(self._header["data_used"])
+            slot = self._find(key)
+            if slot is None:
+                slot = int(self._header["slots_used"])
+            if self.data_start + data_used + need > self.size or slot >= self.slots:
+                print(f"共享股價快取已滿，清空重建 (generation {int(self._header['generation']) + 1})")
+                self._reset(int(self._header["generation"]) + 1)
+                data_used, slot = 0, 0
+
+            offset = self.data_start + data_used
+            self._write(offset, np.asarray(dates, dtype="<i4"))
+            self._write(offset + _align(4 * length), np.asarray(close, dtype="<f4"))
+            self._write(offset + 2 * _align(4 * length), np.asarray(volume, dtype="<i8"))
+
+            self._index[slot] = (key[0], key[1], key[2], time.time() + ttl, offset, length, 0)
+            self._header["data_used"] = data_used + need
+            self._header["slots_used"] = max(int(self._header["slots_used"]), slot + 1)
+
+    def _write(self, offset, array):
+        self._mm[offset:offset + array.nbytes] = array.tobytes()
+
+    def stats(self):
+        with self._locked(exclusive=False):
+            total = self._hits + self._misses
+            return {
+                "path": self.path,
+                "size": self.size,
+                "generation": int(self._header["generation"]),
+                "data_used": int(self._header["data_used"]),
+                "slots_used": int(self._header["slots_used"]),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 3) if total else 0.0,
+            }
+
+
+def _days(day):
+    return int((np.datetime64(day, "D") - np.datetime64("1970-01-01", "D")).astype(np.int64))
@@ -0,0 +1,37 @@
+import threading
+
+
+# 相同 key 的工作在執行中時只跑一次，其他請求者掛在同一份工作上等結果
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = {}
+        self._started = 0
+        self._coalesced = 0
+
+    # 加入 key 的等待名單；回傳 True 表示由呼叫端負責啟動工作
+    def join(self, key, waiter):
+        with self._lock:
+            waiters = self._waiters.get(key)
+            if waiters is not None:
+                if waiter not in waiters:
+                    waiters.append(waiter)
+                self._coalesced += 1
+                return False
+            self._waiters[key] = [waiter]
+            self._started += 1
+            return True
+
+    # 工作結束（或被放棄），取出所有等待者並釋放 key
+    def finish(self, key):
+        with self._lock:
+            return self._waiters.pop(key, [])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._waiters),
+                "waiting": sum(len(w) for w in self._waiters.values()),
+                "started": self._started,
+                "coalesced": self._coalesced,
+            }
@@ -0,0 +1,98 @@
+import argparse
+import csv
+import os
+
+import requests
+from bs4 import BeautifulSoup
+
+# 從證交所 ISIN 公開資料重新產生上市櫃股票清單 data/tw_listings.csv：
+#   python -m update_listings [--output PATH]
+# 代號、名稱、市場以官方資料為準；原檔中人工維護的英文名稱與別名依代號保留
+
+SOURCES = {
+    "TWSE": "https://isin.twse.com.tw/isin/C_public.jsp?strMode=2",
+    "TPEx": "https://isin.twse.com.tw/isin/C_public.jsp?strMode=4",
+}
+# 收錄的有價證券種類（權證等不收錄）
+TYPES = (
+    "股票", "ETF", "ETN", "特別股", "創新板", "臺灣存託憑證(TDR)",
+    "受益證券-不動產投資信託", "受益證券-資產基礎證券",
+)
+FIELDS = ["code", "name", "english_name", "market", "aliases"]
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tw_listings.csv")
+
+
+# 解析 ISIN 頁面：只有一格的列是種類標題，其餘列第一格為「代號　名稱」（全形空白分隔）
+def parse_isin(html):
+    soup = BeautifulSoup(html, "html.parser")
+    entries = []
+    kind = None
+    for tr in soup.find_all("tr"):
+        cells = [td.get_text(strip=True) for td in tr.find_all("td")]
+        if len(cells) == 1:
+            kind = cells[0]
+        elif kind in TYPES and cells and "　" in cells[0]:
+            code, name = cells[0].split("　", 1)
+            entries.append((kind, code.strip(), name.strip()))
+    return entries
+
+
+def fetch_isin(url, timeout=30):
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    response.encoding = "cp950"
+    return parse_isin(response.text)
+
+
+def load_existing(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {row["code"]: row for row in csv.DictReader(f)}
+
+
+# 合併官方清單與既有的英文名稱、別名；名稱變更時舊名稱保留為別名
+def merge(entries_by_market, existing):
+    rows = {}
+    for market, entries in entries_by_market.items():
+        for _, code, name in entries:
+            old = existing.get(code, {})
+            aliases = [a for a in old.get("aliases", "").split("|") if a]
+            if old.get("name") and old["name"] != name and old["name"] not in aliases:
+                aliases.append(old["name"])
+            rows[code] = {
+                "code": code,
+                "name": name,
+                "english_name": old.get("english_name", ""),
+                "market": market,
+                "aliases": "|".join(aliases),
+            }
+    return [rows[code] for code in sorted(rows)]
+
+
+def write(path, rows):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="重新產生上市櫃股票清單")
+    parser.add_argument("--output", default=DEFAULT_PATH)
+    args = parser.parse_args()
+
+    entries_by_market = {market: fetch_isin(url) for market, url in SOURCES.items()}
+    for market, entries in entries_by_market.items():
+        if not entries:
+            raise SystemExit(f"{market} 清單為空，可能是來源格式改變，不覆寫既有檔案")
+
+    rows = merge(entries_by_market, load_existing(args.output))
+    write(args.output, rows)
+    print(f"已寫入 {len(rows)} 筆到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
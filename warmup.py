@@ -0,0 +1,81 @@
+import datetime as dt
+import sys
+import threading
+import time
+
+from market_hours import TAIPEI, is_trading_day, now_taipei
+
+
+# 熱門股票預熱排程：在交易日的指定時間（台北時間）呼叫 warm(stock_ids)，
+# 預先抓取股價、基本面並繪製圖表，讓使用者的第一次查詢就命中快取
+class WarmupScheduler:
+    def __init__(self, stock_ids, times, warm):
+        self.stock_ids = stock_ids
+        self.times = sorted(times)
+        self.warm = warm
+        self._thread = None
+        self.last_run = None
+        self.last_duration = None
+
+    # 下一次預熱時間：今天或之後第一個交易日的排程時間
+    def next_run(self, now=None):
+        now = now or now_taipei()
+        day = now.date()
+        while True:
+            if is_trading_day(day):
+                for t in self.times:
+                    run_at = dt.datetime.combine(day, t, tzinfo=TAIPEI)
+                    if run_at > now:
+                        return run_at
+            day += dt.timedelta(days=1)
+
+    def run_once(self):
+        started = time.monotonic()
+        print(f"預熱開始: {', '.join(self.stock_ids)}")
+        try:
+            self.warm(self.stock_ids)
+        except Exception as e:
+            print(f"預熱失敗: {str(e)}")
+        self.last_run = now_taipei()
+        self.last_duration = time.monotonic() - started
+        print(f"預熱完成，耗時 {self.last_duration:.2f}s")
+
+    def run_forever(self):
+        while True:
+            run_at = self.next_run()
+            print(f"下一次預熱: {run_at.isoformat()}")
+            time.sleep(max(0.0, (run_at - now_taipei()).total_seconds()))
+            self.run_once()
+
+    # 在目前行程以背景執行緒執行排程
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name="warmup", daemon=True)
+            self._thread.start()
+
+    def stats(self):
+        return {
+            "stock_ids": self.stock_ids,
+            "times": [t.strftime("%H:%M") for t in self.times],
+            "next_run": self.next_run().isoformat(),
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+        }
+
+
+def parse_times(text):
+    return [dt.time.fromisoformat(t.strip()) for t in text.split(",") if t.strip()]
+
+
+# 獨立行程執行：python -m warmup（依排程）或 python -m warmup --once（立即預熱一次）
+def main():
+    from app import warmup_scheduler
+
+    if "--once" in sys.argv[1:]:
+        warmup_scheduler.run_once()
+    else:
+        warmup_scheduler.run_forever()
+
+
+if __name__ == "__main__":
+    main()
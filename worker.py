@@ -0,0 +1,92 @@
+import os
+import socket
+import threading
+import time
+
+from app import (
+    JOB_DB_PATH, JOB_VISIBILITY_TIMEOUT, JOB_MAX_ATTEMPTS, JOB_QUEUE_LIMIT, JOB_RETENTION,
+    REPORT_DEADLINE, REPORT_FAILED_MESSAGE, TIMEOUT_MESSAGE, build_report, push_report
+)
+from deadline import Deadline, DeadlineExceeded
+from jobs import JobQueue
+from linebot.v3.messaging import TextMessage
+
+# worker 設定：執行緒數量與佇列輪詢間隔
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "2"))
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "1"))
+# 從排入佇列起算的工作期限（可跨越重啟與重試），超過時只推播逾時通知
+JOB_DEADLINE = float(os.getenv("JOB_DEADLINE", "600"))
+# 清除舊工作的間隔秒數
+JOB_PURGE_INTERVAL = float(os.getenv("JOB_PURGE_INTERVAL", "3600"))
+
+# worker 一定使用 sqlite 佇列，不依賴 web 行程的 REPORT_QUEUE_BACKEND 設定
+job_queue = JobQueue(JOB_DB_PATH, JOB_VISIBILITY_TIMEOUT, JOB_MAX_ATTEMPTS, max_pending=JOB_QUEUE_LIMIT)
+
+
+# 單一 worker 執行緒：領取工作、產生報告、推播給所有等待的使用者
+def run_worker(worker_id):
+    print(f"[{worker_id}] worker 啟動")
+    while True:
+        for job in job_queue.reap_expired():
+            print(f"[{worker_id}] 工作 {job['id']} 租約過期且重試次數用完")
+            push_report(job["user_ids"], [TextMessage(text=REPORT_FAILED_MESSAGE)])
+
+        job = job_queue.claim(worker_id)
+        if job is None:
+            time.sleep(WORKER_POLL_INTERVAL)
+            continue
+
+        print(f"[{worker_id}] 執行工作 {job['id']} ({job['stock_id']})，第 {job['attempts']} 次")
+        job_deadline = Deadline.from_timestamp(job["created_at"], JOB_DEADLINE)
+        try:
+            job_deadline.check("排隊")
+            deadline = Deadline(min(REPORT_DEADLINE, job_deadline.remaining()))
+            messages = build_report(job["stock_id"], deadline)
+            deadline.check("推播")
+        except DeadlineExceeded as e:
+            print(f"[{worker_id}] 工作 {job['id']} 逾時: {str(e)}")
+            finish_job(worker_id, job, job_queue.complete(job), [TextMessage(text=TIMEOUT_MESSAGE)])
+            continue
+        except Exception as e:
+            print(f"[{worker_id}] 工作 {job['id']} 失敗: {str(e)}")
+            finish_job(worker_id, job, job_queue.fail(job, str(e)), [TextMessage(text=REPORT_FAILED_MESSAGE)])
+            continue
+
+        finish_job(worker_id, job, job_queue.complete(job), messages)
+
+
+# 推播結果；user_ids 為 None 表示租約已過期、工作由其他 worker 接手，不重複推播
+def finish_job(worker_id, job, user_ids, messages):
+    if user_ids is None:
+        print(f"[{worker_id}] 工作 {job['id']} 租約已過期，結果交由重新領取的 worker 推播")
+        return
+    push_report(user_ids, messages)
+
+
+# 定期刪除保留期限已過的完成／失敗工作
+def run_purge():
+    while True:
+        try:
+            purged = job_queue.purge(JOB_RETENTION)
+            if purged:
+                print(f"已清除 {purged} 筆舊工作")
+        except Exception as e:
+            print(f"清除舊工作失敗: {str(e)}")
+        time.sleep(JOB_PURGE_INTERVAL)
+
+
+def main():
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    threads = [
+        threading.Thread(target=run_worker, args=(f"{prefix}-{i}",), daemon=True)
+        for i in range(WORKER_THREADS)
+    ]
+    threads.append(threading.Thread(target=run_purge, name="job-purge", daemon=True))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+if __name__ == "__main__":
+    main()